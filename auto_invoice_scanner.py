@@ -6,15 +6,12 @@ Automatically scans photos, detects invoices, extracts data, and sends to Telegr
 
 import os
 import sys
-import cv2
-import numpy as np
-import pytesseract
 import re
 from datetime import datetime
-from PIL import Image
-import json
-from pathlib import Path
 from invoice_sender import InvoiceSender
+from image_catalog import ImageCatalog
+from invoice_ocr import INVOICE_KEYWORDS, ParallelOcr, default_ocr_workers, extract_text, is_invoice_text
+from telegram_outbox import TelegramOutbox, OutboxSender, default_drain_timeout, file_dedupe_key
 
 class AutoInvoiceScanner:
     def __init__(self):
@@ -30,28 +27,30 @@ class AutoInvoiceScanner:
         ]
         
         # Supported image formats
-        self.image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
+        self.image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
         
         # Invoice keywords to identify invoice images
-        self.invoice_keywords = [
-            'invoice', 'bill', 'receipt', 'total', 'amount', 'due', 'paid',
-            'subtotal', 'tax', 'qty', 'quantity', 'price', 'cost', 'payment',
-            'invoice#', 'inv#', 'receipt#', 'bill#', 'date', 'customer'
-        ]
+        self.invoice_keywords = list(INVOICE_KEYWORDS)
+        
+        # Persistent catalog shared with the face finder
+        self.catalog = ImageCatalog()
+        
+        # Invoices are queued durably; images already delivered are skipped before OCR
+        self.outbox = TelegramOutbox(self.sender.bot_token)
+        
+        # Worker processes used for OCR (1 = OCR in this process)
+        self.ocr_workers = default_ocr_workers()
+        self._parallel_ocr = None
         
     def find_all_images(self):
-        """Find all image files in common photo folders"""
-        image_files = []
+        """Find all image files in common photo folders (catalog entries with path, size and mtime)"""
+        stats = self.catalog.refresh(self.photo_folders, self.image_extensions)
+        if stats['rescanned']:
+            print(f"🔍 Scanned {stats['rescanned']} changed folders ({stats['unchanged']} unchanged)")
+        else:
+            print(f"🗂️  Catalog up to date ({stats['unchanged']} folders unchanged)")
         
-        for folder in self.photo_folders:
-            if os.path.exists(folder):
-                print(f"🔍 Scanning: {folder}")
-                
-                for root, dirs, files in os.walk(folder):
-                    for file in files:
-                        if any(file.lower().endswith(ext) for ext in self.image_extensions):
-                            full_path = os.path.join(root, file)
-                            image_files.append(full_path)
+        image_files = self.catalog.images(self.photo_folders)
                             
         print(f"📸 Found {len(image_files)} images total")
         return image_files
@@ -59,42 +58,15 @@ class AutoInvoiceScanner:
     def extract_text_from_image(self, image_path):
         """Extract text from image using OCR"""
         try:
-            # Read image
-            image = cv2.imread(image_path)
-            if image is None:
-                return ""
-                
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply image preprocessing to improve OCR
-            # Denoise
-            denoised = cv2.fastNlMeansDenoising(gray)
-            
-            # Threshold to get better contrast
-            _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # Extract text using Tesseract
-            text = pytesseract.image_to_string(thresh, config='--psm 6')
-            
-            return text.strip()
-            
+            return extract_text(image_path) or ""
         except Exception as e:
             print(f"⚠️  Error processing {image_path}: {e}")
             return ""
     
     def is_invoice_image(self, text):
         """Check if extracted text indicates this is an invoice"""
-        if not text:
-            return False
-            
-        text_lower = text.lower()
-        
-        # Count how many invoice keywords are found
-        keyword_count = sum(1 for keyword in self.invoice_keywords if keyword in text_lower)
-        
         # If we find multiple invoice-related keywords, it's likely an invoice
-        return keyword_count >= 3
+        return is_invoice_text(text, self.invoice_keywords)
     
     def extract_invoice_data(self, text, image_path):
         """Extract structured invoice data from OCR text"""
@@ -201,122 +173,194 @@ class AutoInvoiceScanner:
         
         return invoice_data
     
-    def process_images(self, max_images=10):
-        """Process images and send invoices to Telegram"""
-        print("🤖 Starting Automatic Invoice Scanner")
-        print("=" * 50)
-        
-        # Find all images
-        image_files = self.find_all_images()
-        
-        if not image_files:
-            print("❌ No images found in common folders")
+    def _start_outbox_sender(self):
+        """Start a background sender for queued invoices (including leftovers from earlier runs)"""
+        sender = OutboxSender(self.outbox, {'invoice': self._deliver_queued_invoice})
+        sender.start()
+        return sender
+    
+    def _deliver_queued_invoice(self, item):
+        """Outbox handler for queued invoices (raises so the outbox can tell permanent failures apart)"""
+        self.sender.post_invoice(item['payload'], item['chat_id'])
+        return True
+    
+    @staticmethod
+    def _invoice_key(image):
+        """Dedupe key from the catalogued size and mtime (no stat; the file may be gone by now)"""
+        return file_dedupe_key('invoice', image.path, image.size, image.mtime)
+    
+    def _already_sent(self, image):
+        """True if the invoice from this (unchanged) image was already delivered"""
+        return self.outbox.was_sent(self.sender.chat_id, self._invoice_key(image))
+    
+    def _queue_invoice(self, sender, invoice_data, image):
+        """Queue an invoice for delivery, returning its outbox id (None if it was already sent)"""
+        item_id = self.outbox.enqueue('invoice', self.sender.chat_id, self._invoice_key(image), invoice_data)
+        if item_id is not None:
+            sender.wake()
+        return item_id
+    
+    def _finish_outbox_sender(self, sender, item_ids):
+        """Wait for queued invoices to go out and return how many of item_ids were delivered"""
+        if not sender.drain(default_drain_timeout()):
+            print("⏳ Some invoices are still queued; they will be retried on the next run")
+        sender.stop()
+        return sum(1 for status in self.outbox.statuses(item_ids).values() if status == 'sent')
+    
+    def iter_texts(self, image_paths, workers=None):
+        """
+        Yield (image_path, text) in input order; text is an exception if OCR failed
+        and None if the image was ruled out before full OCR
+        """
+        workers = workers or self.ocr_workers
+        if workers <= 1:
+            for image_path in image_paths:
+                try:
+                    text = extract_text(image_path)
+                except Exception as e:
+                    text = e
+                yield image_path, text
             return
         
+        if self._parallel_ocr is None or self._parallel_ocr.workers != workers:
+            self.close()
+            self._parallel_ocr = ParallelOcr(workers)
+        yield from self._parallel_ocr.stream(image_paths)
+    
+    def close(self):
+        """Shut down OCR worker processes"""
+        if self._parallel_ocr is not None:
+            self._parallel_ocr.close()
+            self._parallel_ocr = None
+    
+    def _scan_images(self, image_files, max_images, progress=None, workers=None):
+        """
+        OCR up to max_images catalogued images and queue the invoices found.
+        OCR runs on the worker pool while the outbox sender delivers invoices in parallel.
+        Returns (processed, found, sent).
+        """
         processed_count = 0
         invoice_count = 0
+        queued_ids = []
+        sender = self._start_outbox_sender()
+        candidates = image_files[:max_images]
+        total = len(candidates)
+        if progress:
+            progress(stage='scanning', checked=0, total=total, found=0)
         
-        print(f"\n📋 Processing up to {max_images} images...")
-        print("⏳ This may take a few minutes...")
+        # Images whose invoice was already delivered are skipped before any OCR
+        to_ocr = {}
+        for image in candidates:
+            if self._already_sent(image):
+                print(f"⏭️  Invoice already sent, skipping: {os.path.basename(image.path)}")
+            else:
+                to_ocr[image.path] = image
         
-        for i, image_path in enumerate(image_files[:max_images]):
-            try:
-                print(f"\n📸 [{i+1}/{min(len(image_files), max_images)}] Processing: {os.path.basename(image_path)}")
+        print(f"⚙️  OCR workers: {workers or self.ocr_workers}")
+        results = self.iter_texts(list(to_ocr), workers)
+        try:
+            for i, (image_path, text) in enumerate(results):
+                if progress:
+                    progress(checked=total - len(to_ocr) + i, found=invoice_count)
+                print(f"\n📸 [{i+1}/{len(to_ocr)}] Processing: {os.path.basename(image_path)}")
+                
+                if isinstance(text, Exception):
+                    print(f"   ❌ Error: {text}")
+                    continue
                 
-                # Extract text from image
-                text = self.extract_text_from_image(image_path)
+                if text is None:
+                    print("   ⏭️  Not a document or no invoice keywords in the quick pass, full OCR skipped")
+                    continue
                 
                 if not text:
                     print("   ⚠️  No text detected")
                     continue
                 
-                # Check if it's an invoice
-                if self.is_invoice_image(text):
-                    print("   ✅ Invoice detected!")
-                    
-                    # Extract invoice data
-                    invoice_data = self.extract_invoice_data(text, image_path)
+                try:
+                    # Check if it's an invoice
+                    if self.is_invoice_image(text):
+                        print("   ✅ Invoice detected!")
+                        
+                        # Extract invoice data
+                        invoice_data = self.extract_invoice_data(text, image_path)
+                        
+                        # Queue for Telegram; the background sender retries failures
+                        item_id = self._queue_invoice(sender, invoice_data, to_ocr[image_path])
+                        if item_id is None:
+                            print("   ⏭️  Invoice already sent, skipping")
+                        else:
+                            queued_ids.append(item_id)
+                            invoice_count += 1
+                            print(f"   📤 Queued invoice #{invoice_count} for Telegram")
+                    else:
+                        print("   ℹ️  Not an invoice image")
                     
-                    # Send to Telegram
-                    success = self.sender.send_invoice(invoice_data)
+                    processed_count += 1
                     
-                    if success:
-                        invoice_count += 1
-                        print(f"   📤 Sent invoice #{invoice_count} to Telegram")
-                    else:
-                        print("   ❌ Failed to send to Telegram")
-                else:
-                    print("   ℹ️  Not an invoice image")
-                
-                processed_count += 1
-                
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
-                continue
+                except Exception as e:
+                    print(f"   ❌ Error: {e}")
+                    continue
+        finally:
+            results.close()
+        
+        if progress:
+            progress(stage='sending', checked=total, found=invoice_count)
+        sent_count = self._finish_outbox_sender(sender, queued_ids)
+        if progress:
+            progress(sent=sent_count)
+        return processed_count, invoice_count, sent_count
+    
+    def process_images(self, max_images=10, progress=None, workers=None):
+        """
+        Process images and send invoices to Telegram, returning how many were sent.
+        progress, if given, is called with keyword updates (stage, checked, total, found, sent).
+        """
+        print("🤖 Starting Automatic Invoice Scanner")
+        print("=" * 50)
+        
+        # Find all images
+        image_files = self.find_all_images()
+        
+        if not image_files:
+            print("❌ No images found in common folders")
+            return 0
+        
+        print(f"\n📋 Processing up to {max_images} images...")
+        print("⏳ This may take a few minutes...")
+        
+        processed_count, invoice_count, sent_count = self._scan_images(image_files, max_images, progress, workers)
         
         print(f"\n🎉 Scan Complete!")
         print(f"📊 Processed: {processed_count} images")
         print(f"🧾 Found: {invoice_count} invoices")
-        print(f"📱 Sent to Telegram: {invoice_count} invoices")
+        print(f"📱 Sent to Telegram: {sent_count} invoices")
+        return sent_count
     
-    def scan_specific_folder(self, folder_path, max_images=20):
-        """Scan a specific folder for invoices"""
+    def scan_specific_folder(self, folder_path, max_images=20, progress=None, workers=None):
+        """Scan a specific folder for invoices, returning how many were sent"""
         if not os.path.exists(folder_path):
             print(f"❌ Folder not found: {folder_path}")
-            return
+            return 0
             
         print(f"🔍 Scanning specific folder: {folder_path}")
         
-        image_files = []
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if any(file.lower().endswith(ext) for ext in self.image_extensions):
-                    image_files.append(os.path.join(root, file))
+        self.catalog.refresh([folder_path], self.image_extensions)
+        image_files = self.catalog.images([folder_path])
         
         if not image_files:
             print("❌ No images found in the specified folder")
-            return
+            return 0
         
         print(f"📸 Found {len(image_files)} images in folder")
         
         # Process images (reuse the same logic)
-        processed_count = 0
-        invoice_count = 0
-        
-        for i, image_path in enumerate(image_files[:max_images]):
-            try:
-                print(f"\n📸 [{i+1}/{min(len(image_files), max_images)}] Processing: {os.path.basename(image_path)}")
-                
-                text = self.extract_text_from_image(image_path)
-                
-                if not text:
-                    print("   ⚠️  No text detected")
-                    continue
-                
-                if self.is_invoice_image(text):
-                    print("   ✅ Invoice detected!")
-                    
-                    invoice_data = self.extract_invoice_data(text, image_path)
-                    success = self.sender.send_invoice(invoice_data)
-                    
-                    if success:
-                        invoice_count += 1
-                        print(f"   📤 Sent invoice #{invoice_count} to Telegram")
-                    else:
-                        print("   ❌ Failed to send to Telegram")
-                else:
-                    print("   ℹ️  Not an invoice image")
-                
-                processed_count += 1
-                
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
-                continue
+        processed_count, invoice_count, sent_count = self._scan_images(image_files, max_images, progress, workers)
         
         print(f"\n🎉 Folder Scan Complete!")
         print(f"📊 Processed: {processed_count} images")
         print(f"🧾 Found: {invoice_count} invoices")
-        print(f"📱 Sent to Telegram: {invoice_count} invoices")
+        print(f"📱 Sent to Telegram: {sent_count} invoices")
+        return sent_count
 
 def main():
     """Main function"""
@@ -348,6 +392,8 @@ def main():
         print("\n🛑 Scan cancelled by user")
     except Exception as e:
         print(f"❌ Error: {e}")
+    finally:
+        scanner.close()
 
 if __name__ == "__main__":
     main()
@@ -10,6 +10,7 @@ import time
 import re
 from simple_face_finder import SimpleFaceFinder
 from simple_telegram_bot import SimpleTelegramBot
+from job_manager import JobManager, JobQueueFull, DONE
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -18,9 +19,12 @@ load_dotenv()
 class ChatbotInterface:
     def __init__(self):
         self.bot = SimpleTelegramBot()
-        self.face_finder = SimpleFaceFinder()
+        self._face_finder = None
         self.running = False
         
+        # Sends run in the background (one at a time) so the conversation stays responsive
+        self.jobs = JobManager(max_workers=1)
+        
         # Greeting messages
         self.greetings = [
             "Hello! I'm your Sapier assistant. How can I help you today?",
@@ -38,12 +42,20 @@ class ChatbotInterface:
    - "Send photos with faces to Telegram"
 
 2. Other commands:
+   - "status" - Show the progress of running sends
    - "help" - Show this help message
    - "exit" or "quit" - Exit the chatbot
 
 Just type what you'd like me to do!
 """
     
+    @property
+    def face_finder(self):
+        """The face finder, created on first use so the chatbot starts instantly"""
+        if self._face_finder is None:
+            self._face_finder = SimpleFaceFinder()
+        return self._face_finder
+    
     def start(self):
         """Start the chatbot interface"""
         self.running = True
@@ -94,6 +106,9 @@ Just type what you'd like me to do!
         if input_lower in ['help', 'commands', '?']:
             return self.help_message
         
+        if input_lower in ['status', 'jobs']:
+            return self.job_status()
+        
         # Send son's pictures to Telegram
         if re.search(r'send\s+my\s+sons?\s+pictures?\s+to\s+telegram', input_lower) or \
            re.search(r'send\s+sons?\s+pictures?\s+to\s+telegram', input_lower) or \
@@ -113,35 +128,57 @@ Just type what you'd like me to do!
         # Default response for unrecognized input
         return "I'm not sure what you're asking. Type 'help' to see what I can do."
     
+    def start_job(self, kind, description, func):
+        """Run func(progress) in the background and return a reply right away"""
+        def on_change(job):
+            if job.status == DONE:
+                print(f"\n🤖 Done: {description}, sent {job.result or 0} photos. Check your messages.")
+            elif not job.active:
+                print(f"\n🤖 Sorry, I couldn't send the photos: {job.error}")
+        
+        try:
+            job, created = self.jobs.submit(kind, func, dedupe_key=kind, listener=on_change)
+        except JobQueueFull:
+            return "I'm already busy with several requests. Please try again later."
+        
+        if not created:
+            return f"I'm already working on that (job {job.id}). Type 'status' to follow it."
+        return f"On it! I'm sending {description} in the background. Type 'status' to see progress."
+    
+    def job_status(self):
+        """Describe queued and running sends"""
+        active = [job for job in self.jobs.jobs() if job['status'] in ('queued', 'running')]
+        if not active:
+            return "Nothing is running right now."
+        
+        lines = []
+        for job in active:
+            progress = job['progress']
+            details = ", ".join(f"{name} {value}" for name, value in progress.items()) or "waiting"
+            lines.append(f"• {job['kind']} ({job['status']}): {details}")
+        return "\n".join(lines)
+    
     def send_son_photos(self):
         """Send son's photos to Telegram"""
-        try:
-            print("🔍 Looking for son's photos...")
-            
-            # Use the face finder to find and send photos with the "son" search mode
-            self.face_finder.find_and_send_face_images(max_images=10, search_mode="son")
-            
-            return "I've sent your son's photos to Telegram! Check your messages."
-        except Exception as e:
-            return f"Sorry, I couldn't send the photos: {str(e)}"
+        print("🔍 Looking for son's photos...")
+        
+        # Use the face finder to find and send photos with the "son" search mode
+        return self.start_job('son', "your son's photos", lambda progress:
+                              self.face_finder.find_and_send_face_images(max_images=10, search_mode="son",
+                                                                         progress=progress))
     
     def send_recent_photos(self):
         """Send recent photos to Telegram"""
-        try:
-            print("📸 Sending recent photos...")
-            self.face_finder.send_recent_photos(max_images=5)
-            return "I've sent 5 recent photos to Telegram! Check your messages."
-        except Exception as e:
-            return f"Sorry, I couldn't send the photos: {str(e)}"
+        print("📸 Sending recent photos...")
+        return self.start_job('recent', "5 recent photos", lambda progress:
+                              self.face_finder.send_recent_photos(max_images=5, progress=progress))
     
     def send_face_photos(self):
         """Send photos with faces to Telegram"""
-        try:
-            print("👤 Looking for photos with faces...")
-            self.face_finder.find_and_send_face_images(max_images=5, search_mode="faces")
-            return "I've sent 5 photos with faces to Telegram! Check your messages."
-        except Exception as e:
-            return f"Sorry, I couldn't send the photos: {str(e)}"
+        print("👤 Looking for photos with faces...")
+        return self.start_job('faces', "5 photos with faces", lambda progress:
+                              self.face_finder.find_and_send_face_images(max_images=5, search_mode="faces",
+                                                                         progress=progress))
 
 def main():
     """Main function"""
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Face Detection Cache
+Persistent SQLite cache of face-detection results keyed by file identity.
+
+An entry is reused when the file's path, size and mtime and the detector
+parameters all match. With content hashing enabled (SAPIER_DETECTION_CACHE_HASH=1)
+a renamed or copied file is also recognised by the SHA-1 of its bytes. The cache
+is bounded to SAPIER_DETECTION_CACHE_MAX entries; the least recently used
+entries are evicted first.
+
+Eviction only needs approximate recency, so hits don't write: an entry's
+last_used is refreshed at most once per TOUCH_INTERVAL, and those refreshes
+are buffered and written in batches (with the next put, every TOUCH_BATCH
+hits, or on flush/close).
+"""
+
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from sapier_storage import data_path, connect, file_sha1
+
+# Seconds an entry's last_used may lag behind before a hit refreshes it
+TOUCH_INTERVAL = 3600
+
+# Buffered last_used refreshes that force a write
+TOUCH_BATCH = 500
+
+# Content hashes computed on a miss, kept for the put that follows detection
+MAX_MISS_HASHES = 4096
+
+
+class DetectionCache:
+    def __init__(self, db_path=None, max_entries=None, use_content_hash=None):
+        self.db_path = db_path or data_path('detection_cache.db')
+        self.max_entries = max_entries or int(os.getenv('SAPIER_DETECTION_CACHE_MAX', '200000'))
+        if use_content_hash is None:
+            use_content_hash = os.getenv('SAPIER_DETECTION_CACHE_HASH', '0') == '1'
+        self.use_content_hash = use_content_hash
+
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS detections (
+                path TEXT NOT NULL,
+                params TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                content_hash TEXT,
+                face_count INTEGER NOT NULL,
+                boxes TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (path, params)
+            );
+            CREATE INDEX IF NOT EXISTS detections_hash ON detections(content_hash, params);
+            CREATE INDEX IF NOT EXISTS detections_last_used ON detections(last_used);
+        """)
+        self._conn.commit()
+        self._inserts_since_trim = 0
+        self._touched = {}
+        self._miss_hashes = OrderedDict()
+
+    @staticmethod
+    def params_key(params):
+        """Serialise detector parameters into a stable cache key"""
+        return json.dumps(params, sort_keys=True, separators=(',', ':'))
+
+    def get(self, path, size, mtime, params_key):
+        """Return cached boxes for an unchanged file, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, boxes, last_used FROM detections WHERE path = ? AND params = ?",
+                (path, params_key)
+            ).fetchone()
+
+            if row and row[0] == size and row[1] == mtime:
+                now = time.time()
+                if now - row[3] > TOUCH_INTERVAL:
+                    self._touched[(path, params_key)] = now
+                    if len(self._touched) >= TOUCH_BATCH:
+                        self._flush_touched()
+                        self._conn.commit()
+                return json.loads(row[2])
+
+        if not self.use_content_hash:
+            return None
+
+        try:
+            content_hash = file_sha1(path)
+        except OSError:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT boxes FROM detections WHERE content_hash = ? AND params = ? LIMIT 1",
+                (content_hash, params_key)
+            ).fetchone()
+
+            if row is None:
+                # Keep the hash so the put after detection doesn't read the file again
+                self._miss_hashes[(path, size, mtime)] = content_hash
+                while len(self._miss_hashes) > MAX_MISS_HASHES:
+                    self._miss_hashes.popitem(last=False)
+                return None
+
+        boxes = json.loads(row[0])
+        self.put(path, size, mtime, params_key, boxes, content_hash=content_hash)
+        return boxes
+
+    def put(self, path, size, mtime, params_key, boxes, content_hash=None):
+        """Store the detection result for a file"""
+        if content_hash is None and self.use_content_hash:
+            with self._lock:
+                content_hash = self._miss_hashes.pop((path, size, mtime), None)
+            if content_hash is None:
+                try:
+                    content_hash = file_sha1(path)
+                except OSError:
+                    content_hash = None
+
+        boxes = [[int(v) for v in box] for box in boxes]
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, params_key, size, mtime, content_hash, len(boxes), json.dumps(boxes), time.time())
+            )
+            self._flush_touched()
+            self._inserts_since_trim += 1
+            if self._inserts_since_trim >= min(1000, max(1, self.max_entries // 10)):
+                self._trim()
+            self._conn.commit()
+
+    def _flush_touched(self):
+        """Write buffered last_used refreshes (caller holds the lock and commits)"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE detections SET last_used = ? WHERE path = ? AND params = ?",
+                [(used, path, params) for (path, params), used in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def flush(self):
+        """Write buffered last_used refreshes now"""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+
+    def _trim(self):
+        """Evict least recently used entries once the cache is over its bound"""
+        self._inserts_since_trim = 0
+        self._flush_touched()
+        count = self._conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+        if count <= self.max_entries:
+            return
+
+        # Evict down to 90% so trimming doesn't run on every insert
+        excess = count - int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM detections WHERE rowid IN "
+            "(SELECT rowid FROM detections ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+
+    def trim(self):
+        """Enforce the size bound now"""
+        with self._lock:
+            self._trim()
+            self._conn.commit()
+
+    def close(self):
+        """Write buffered refreshes and close the underlying database"""
+        with self._lock:
+            self._flush_touched()
+            self._conn.commit()
+            self._conn.close()
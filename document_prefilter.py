@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Document Prefilter
+Cheap "does this look like a document?" check that runs before OCR.
+
+The image is decoded straight to a small color copy (SAPIER_DOC_PREFILTER_SIDE,
+default 512 px) and scored on:
+- text lines: morphological detection of horizontal runs of glyph-sized
+  strokes (the strongest signal);
+- background uniformity: share of pixels close to the dominant bright
+  (paper) level;
+- colorfulness: paper and print are mostly unsaturated;
+- edge density: foliage, crowds and textures are edge-dense everywhere;
+- aspect ratio: only portrait shapes that cameras don't produce count:
+  paper page ratios (A4/ISO 1.414, US Letter 1.294) or receipt strips
+  at least twice as tall as wide. Scans and screenshots of documents get
+  the points; 4:3, 3:2 and 16:9 camera frames (either way round) get none.
+
+Text lines gate everything else: the other features are scaled by
+text_lines / MIN_TEXT_LINES (capped at 1), so a blank wall, snow or sensor
+noise can't pass on uniformity and low saturation alone.
+Images scoring below SAPIER_DOC_PREFILTER_THRESHOLD (default 0.45) skip OCR.
+
+The prefilter is opt-in (SAPIER_DOC_PREFILTER=1) until it has been
+validated on real photos; `python ocr_benchmark.py <sample> --prefilter`
+reports its error rates on a labelled folder.
+"""
+
+import os
+from image_decoding import load_reduced
+
+WEIGHTS = {'lines': 0.45, 'uniformity': 0.25, 'colorfulness': 0.15, 'edges': 0.10, 'aspect': 0.05}
+
+# Text lines needed for a full score on that feature
+FULL_SCORE_LINES = 12
+
+# Text lines from which the other features count in full (fewer scale them down)
+MIN_TEXT_LINES = 3
+
+# Portrait height/width ratios of paper pages, the tolerance around them, and the
+# ratio from which a portrait image counts as a receipt strip
+PAGE_RATIOS = (1.294, 1.414)
+PAGE_RATIO_TOLERANCE = 0.02
+RECEIPT_RATIO = 2.0
+
+
+def prefilter_enabled():
+    return os.getenv('SAPIER_DOC_PREFILTER', '0') == '1'
+
+
+def prefilter_threshold():
+    return float(os.getenv('SAPIER_DOC_PREFILTER_THRESHOLD', '0.45'))
+
+
+def document_aspect(height, width):
+    """1.0 for portrait page or receipt shapes, 0.0 for everything else (camera frames included)"""
+    ratio = height / width
+    if ratio >= RECEIPT_RATIO:
+        return 1.0
+    if any(abs(ratio - page) <= PAGE_RATIO_TOLERANCE for page in PAGE_RATIOS):
+        return 1.0
+    return 0.0
+
+
+def count_text_lines(gray):
+    """Number of line-shaped clusters of glyph-sized strokes"""
+    import cv2
+    height, width = gray.shape[:2]
+    # Dark-on-light strokes stand out after a black-hat; merging them horizontally turns words into lines
+    glyph = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 9))
+    strokes = cv2.morphologyEx(gray, cv2.MORPH_BLACKHAT, glyph)
+    _, strokes = cv2.threshold(strokes, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    joined = cv2.morphologyEx(strokes, cv2.MORPH_CLOSE,
+                              cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, width // 40), 1)))
+    contours, _ = cv2.findContours(joined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    lines = 0
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if 3 <= h <= height // 12 and w >= max(4 * h, width // 20):
+            lines += 1
+    return lines
+
+
+def document_features(image):
+    """Feature scores in [0, 1] for a small BGR image"""
+    import cv2
+    import numpy as np
+    height, width = image.shape[:2]
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    lines = count_text_lines(gray)
+
+    # Paper: a bright histogram peak that most pixels sit close to
+    histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    paper = int(np.argmax(histogram[100:])) + 100
+    near_paper = histogram[max(0, paper - 25):paper + 26].sum() / gray.size
+
+    saturation = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)[:, :, 1].mean()
+    edge_density = np.count_nonzero(cv2.Canny(gray, 80, 160)) / gray.size
+
+    return {
+        'lines': min(1.0, lines / FULL_SCORE_LINES),
+        'uniformity': float(near_paper),
+        'colorfulness': float(max(0.0, 1.0 - saturation / 80.0)),
+        'edges': 1.0 if edge_density <= 0.12 else float(max(0.0, 1.0 - (edge_density - 0.12) / 0.13)),
+        'aspect': document_aspect(height, width),
+        'text_lines': lines,
+        'edge_density': round(float(edge_density), 3),
+    }
+
+
+def document_score(image_path, max_side=None):
+    """Return (score, features) for an image file, or (None, None) if it can't be decoded"""
+    max_side = max_side or int(os.getenv('SAPIER_DOC_PREFILTER_SIDE', '512'))
+    image, _ = load_reduced(image_path, max_side, color=True)
+    if image is None:
+        return None, None
+
+    features = document_features(image)
+    text_gate = min(1.0, features['text_lines'] / MIN_TEXT_LINES)
+    score = sum(weight * features[name] * (1.0 if name == 'lines' else text_gate)
+                for name, weight in WEIGHTS.items())
+    return score, features
+
+
+def looks_like_document(image_path):
+    """False only for images that clearly aren't documents (undecodable images are left to OCR)"""
+    score, _ = document_score(image_path)
+    return score is None or score >= prefilter_threshold()
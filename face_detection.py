@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Face Detection
+OpenCV Haar-cascade face detection, in-process or on a pool of worker processes.
+
+ParallelFaceDetector runs detection on SAPIER_DETECT_WORKERS processes
+(default: one per core) through process_pool.OrderedProcessPool, so results
+come back in submission order.
+
+Large photos are decoded straight to a reduced grayscale image (see
+image_decoding.load_reduced) capped at SAPIER_DETECT_MAX_SIDE pixels on the
+longest side; minSize is scaled to match and boxes are reported in
+original-image coordinates.
+
+The reduction trades small faces for speed: the Haar cascade can't see
+faces smaller than its 24x24 window, so on a 4000 px photo capped at 1600 px
+the smallest detectable face is about 60 px instead of 30 px. Setting
+SAPIER_DETECT_SMALL_FACES=1 stops the reduction where minSize reaches the
+window (0.8 for the default 30 px) and keeps full-resolution sensitivity;
+when that leaves no DCT reduction to use, the photo is simply decoded at
+full size, which is the cheaper option.
+"""
+
+import os
+from image_decoding import load_reduced
+from process_pool import OrderedProcessPool, default_workers
+
+CASCADE_NAME = 'haarcascade_frontalface_default.xml'
+
+# Detection window of the Haar cascade (pixels)
+CASCADE_WINDOW = 24
+
+DEFAULT_DETECTOR_PARAMS = {
+    'scaleFactor': 1.1,
+    'minNeighbors': 5,
+    'minSize': (30, 30)
+}
+
+# Cascade loaded once per worker process by _init_worker
+_worker_cascade = None
+
+
+def default_detect_workers():
+    """Number of detection processes (SAPIER_DETECT_WORKERS overrides)"""
+    return default_workers('SAPIER_DETECT_WORKERS')
+
+
+def default_max_side():
+    """Longest image side used for detection (SAPIER_DETECT_MAX_SIDE, 0 = full resolution)"""
+    return int(os.getenv('SAPIER_DETECT_MAX_SIDE', '1600'))
+
+
+def keep_small_faces():
+    """Whether reduction stops before small faces become undetectable (SAPIER_DETECT_SMALL_FACES, opt-in)"""
+    return os.getenv('SAPIER_DETECT_SMALL_FACES', '0') == '1'
+
+
+def min_detect_scale(params):
+    """Smallest downscale that keeps minSize at or above the cascade window"""
+    min_size = params.get('minSize')
+    if not min_size:
+        return 1.0
+    return min(1.0, CASCADE_WINDOW / min(min_size))
+
+
+def load_cascade():
+    """Load the frontal face Haar cascade"""
+    import cv2  # Deferred so importing this module doesn't load OpenCV
+    return cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_NAME)
+
+
+def detect_faces(image_path, cascade, params, max_side=0):
+    """Detect faces in an image file, returning (x, y, w, h) boxes in original coordinates"""
+    # Read the image as (reduced) grayscale
+    min_scale = min_detect_scale(params) if keep_small_faces() else 0.0
+    gray, scale = load_reduced(image_path, max_side, min_scale=min_scale)
+    if gray is None:
+        return []
+
+    # minSize is expressed in original pixels, so shrink it with the image
+    params = dict(params)
+    if scale < 1.0 and 'minSize' in params:
+        params['minSize'] = tuple(max(1, round(v * scale)) for v in params['minSize'])
+
+    # Detect faces
+    faces = cascade.detectMultiScale(gray, **params)
+
+    return [tuple(int(round(v / scale)) for v in face) for face in faces]
+
+
+def _init_worker():
+    global _worker_cascade
+    _worker_cascade = load_cascade()
+
+
+def _detect_in_worker(image_path, params, max_side):
+    return detect_faces(image_path, _worker_cascade, params, max_side)
+
+
+class ParallelFaceDetector:
+    def __init__(self, params=None, workers=None, max_side=None):
+        self.params = params or DEFAULT_DETECTOR_PARAMS
+        self.workers = workers or default_detect_workers()
+        self.max_side = default_max_side() if max_side is None else max_side
+        self._pool = OrderedProcessPool(self.workers, _init_worker, window_per_worker=4)
+
+    def stream(self, items, lookup=None):
+        """
+        Detect faces for (key, image_path) items in input order.
+
+        Yields (key, boxes_or_exception, detected). lookup(key, image_path) may
+        return boxes for items that need no detection (e.g. cache hits); those
+        are yielded in place with detected=False without touching the pool.
+        """
+        return self._pool.stream(_detect_in_worker, items, (self.params, self.max_side), lookup)
+
+    def close(self):
+        """Shut the worker processes down"""
+        self._pool.close()
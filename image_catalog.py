@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Image Catalog
+Persistent SQLite catalog of the image files under Sapier's photo folders.
+Changed directories are listed in parallel by image_discovery.ImageDiscovery.
+
+A refresh only re-lists directories whose modification time changed since the
+previous run; unchanged directories are answered from the catalog. Note that
+editing a file in place does not touch its directory's mtime, so the stored
+size/mtime of such a file is only updated once its directory changes again
+(or on a full refresh).
+"""
+
+import os
+import threading
+from sapier_storage import data_path, connect
+from image_discovery import ImageDiscovery, ImageFile
+
+
+class ImageCatalog:
+    def __init__(self, db_path=None, max_workers=None):
+        self.db_path = db_path or data_path('image_catalog.db')
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime_ns INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+            CREATE TABLE IF NOT EXISTS images (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                ext TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS images_dir ON images(dir);
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _subtree_bounds(path):
+        """Return the (low, high) key range covering everything below path"""
+        prefix = path.rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def _forget_dir(self, path):
+        """Drop a directory and everything below it from the catalog"""
+        low, high = self._subtree_bounds(path)
+        self._conn.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (path, low, high))
+        self._conn.execute("DELETE FROM images WHERE path >= ? AND path < ?", (low, high))
+
+    def _refresh_roots(self, discovery, roots, full, stats):
+        """Bring the catalog up to date, one directory level at a time"""
+        frontier = list(dict.fromkeys(roots))
+        seen = set(frontier)
+
+        while frontier:
+            known_mtimes = {}
+            for path in frontier:
+                row = self._conn.execute("SELECT mtime_ns FROM dirs WHERE path = ?", (path,)).fetchone()
+                known_mtimes[path] = None if full or not row else row[0]
+
+            next_frontier = []
+            for path, listing in discovery.scan_directories(known_mtimes.items()):
+                if listing is None:
+                    self._forget_dir(path)
+                    continue
+
+                known_children = [r[0] for r in self._conn.execute("SELECT path FROM dirs WHERE parent = ?", (path,))]
+
+                if listing.images is None:
+                    stats['unchanged'] += 1
+                    children = known_children
+                else:
+                    stats['rescanned'] += 1
+                    self._conn.execute("DELETE FROM images WHERE dir = ?", (path,))
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO images VALUES (?, ?, ?, ?, ?)",
+                        [(img.path, path, img.size, img.mtime, os.path.splitext(img.path)[1].lower())
+                         for img in listing.images]
+                    )
+
+                    for gone in set(known_children) - set(listing.subdirs):
+                        self._forget_dir(gone)
+                    # New subdirectories are recorded without an mtime so they are
+                    # listed on this (or, after an interruption, the next) refresh
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, NULL)",
+                        [(sub, path) for sub in listing.subdirs]
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO dirs (path, parent, mtime_ns) VALUES (?, ?, ?)",
+                        (path, os.path.dirname(path), listing.mtime_ns)
+                    )
+                    children = listing.subdirs
+
+                for child in children:
+                    if child not in seen:
+                        seen.add(child)
+                        next_frontier.append(child)
+
+            frontier = next_frontier
+
+    def refresh(self, roots, extensions, full=False):
+        """Update the catalog for the given root folders, returning scan statistics"""
+        stats = {'rescanned': 0, 'unchanged': 0}
+
+        with self._lock, ImageDiscovery(extensions, self.max_workers) as discovery:
+            existing = []
+            for root in roots:
+                if os.path.isdir(root):
+                    existing.append(root)
+                else:
+                    self._forget_dir(root)
+            self._refresh_roots(discovery, existing, full, stats)
+            self._conn.commit()
+
+        return stats
+
+    def images(self, roots, extensions=None):
+        """Return ImageFile records for all catalogued images under roots"""
+        wanted = {ext.lower() for ext in extensions} if extensions else None
+        rows = {}
+
+        with self._lock:
+            for root in roots:
+                low, high = self._subtree_bounds(root)
+                for path, size, mtime, ext in self._conn.execute(
+                    "SELECT path, size, mtime, ext FROM images WHERE path >= ? AND path < ?", (low, high)
+                ):
+                    if wanted is None or ext in wanted:
+                        rows[path] = ImageFile(path, size, mtime)
+
+        return list(rows.values())
+
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
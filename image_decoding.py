@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Image Decoding
+Reduced-resolution image decoding shared by face detection and upload preparation.
+
+Large photos are decoded straight to a smaller image with OpenCV's
+IMREAD_REDUCED_* flags (JPEG DCT scaling, so most pixels are never decoded)
+and then resized so the longest side is at most max_side.
+
+OpenCV and PIL are imported on first use, so importing this module is cheap.
+"""
+
+import math
+
+
+def _reduced_flags(color):
+    """Reduced-decode flags by downscale factor"""
+    import cv2
+    if color:
+        return {8: cv2.IMREAD_REDUCED_COLOR_8, 4: cv2.IMREAD_REDUCED_COLOR_4,
+                2: cv2.IMREAD_REDUCED_COLOR_2, 1: cv2.IMREAD_COLOR}
+    return {8: cv2.IMREAD_REDUCED_GRAYSCALE_8, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+            2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 1: cv2.IMREAD_GRAYSCALE}
+
+
+def read_image_dimensions(image_path):
+    """Return (width, height) from the image header without decoding pixels, or None"""
+    try:
+        from PIL import Image
+    except ImportError:  # Only used to read image dimensions from the header
+        return None
+    try:
+        with Image.open(image_path) as img:
+            return img.size
+    except Exception:
+        return None
+
+
+def load_reduced(image_path, max_side=0, color=False, min_scale=0.0):
+    """
+    Decode an image (grayscale unless color=True) with its longest side capped at max_side.
+
+    Returns (image, scale) where scale maps original coordinates to the returned
+    image, or (None, 1.0) if the file can't be decoded. max_side=0 decodes at
+    full resolution. min_scale bounds the reduction: the cap is raised when it
+    would shrink the image below min_scale of its original size. If the raised
+    cap leaves no DCT reduction to use, the image is decoded at full size
+    without resizing (a resize would cost more than it saves).
+    """
+    import cv2
+    flags = _reduced_flags(color)
+    if not max_side:
+        return cv2.imread(image_path, flags[1]), 1.0
+
+    dimensions = read_image_dimensions(image_path)
+    original_side = max(dimensions) if dimensions else None
+    floor = math.ceil(original_side * min_scale) if original_side else 0
+
+    # Pick the largest DCT reduction that still leaves at least max_side pixels
+    factor = 1
+    if original_side:
+        max_side = max(max_side, floor)
+        for candidate in (8, 4, 2):
+            if original_side // candidate >= max_side:
+                factor = candidate
+                break
+
+    image = cv2.imread(image_path, flags[factor])
+    if image is None:
+        return None, 1.0
+
+    decoded_side = max(image.shape[:2])
+    if original_side is None:
+        original_side = decoded_side * factor
+        floor = math.ceil(original_side * min_scale)
+        max_side = max(max_side, floor)
+    if factor == 1 and floor and floor >= max_side:
+        return image, 1.0
+
+    if decoded_side > max_side:
+        resize = max_side / decoded_side
+        image = cv2.resize(image, None, fx=resize, fy=resize, interpolation=cv2.INTER_AREA)
+
+    return image, max(image.shape[:2]) / original_side
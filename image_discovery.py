@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Image Discovery
+Parallel scandir-based directory listing used by the image catalog.
+
+Directories are listed on a thread pool (scandir releases the GIL, which matters
+on slow or network-backed folders such as OneDrive). Extensions are matched with
+a set lookup, and every image comes back with the size and mtime taken from its
+DirEntry so callers can sort and filter without stat-ing the file again.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+ImageFile = namedtuple('ImageFile', ['path', 'size', 'mtime'])
+DirectoryListing = namedtuple('DirectoryListing', ['path', 'mtime_ns', 'images', 'subdirs'])
+
+
+def default_scan_workers():
+    """Number of directory-listing threads (SAPIER_SCAN_WORKERS overrides)"""
+    configured = os.getenv('SAPIER_SCAN_WORKERS')
+    if configured:
+        return max(1, int(configured))
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+class ImageDiscovery:
+    def __init__(self, extensions, max_workers=None):
+        self.extensions = frozenset(ext.lower() for ext in extensions)
+        self.max_workers = max_workers or default_scan_workers()
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the worker threads"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def scan_directory(self, path, known_mtime_ns=None):
+        """List one directory; images/subdirs are None if its mtime still equals known_mtime_ns"""
+        mtime_ns = os.stat(path).st_mtime_ns
+        if known_mtime_ns is not None and mtime_ns == known_mtime_ns:
+            return DirectoryListing(path, mtime_ns, None, None)
+
+        images = []
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    if os.path.splitext(entry.name)[1].lower() in self.extensions and entry.is_file():
+                        st = entry.stat()
+                        images.append(ImageFile(entry.path, st.st_size, st.st_mtime))
+                except OSError:
+                    continue
+
+        return DirectoryListing(path, mtime_ns, images, subdirs)
+
+    def _scan_or_none(self, item):
+        path, known_mtime_ns = item
+        try:
+            return path, self.scan_directory(path, known_mtime_ns)
+        except OSError:
+            return path, None
+
+    def scan_directories(self, items):
+        """Scan (path, known_mtime_ns) pairs in parallel, yielding (path, listing or None on error)"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='image-scan')
+        return self._executor.map(self._scan_or_none, items)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Import-Time Benchmark
+Measures how long Sapier's entry points take to import on a cold interpreter,
+and checks that none of them pulls in the heavy vision/OCR/HTTP libraries
+(cv2, numpy, pytesseract, PIL, httpx, h2) at import time. Those must only load
+when a detection, OCR or async-send operation first needs them. Importing must
+not start threads either (a background thread could load them later and make
+the check depend on timing).
+
+Usage:
+    python import_benchmark.py            # all entry points, 5 runs each
+    python import_benchmark.py -n 10 chatbot_interface
+Exits with status 1 if a heavy module is imported eagerly or a thread is started.
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ENTRY_POINTS = [
+    'chatbot_interface',
+    'photo_sender_app',
+    'simple_telegram_bot',
+    'simple_face_finder',
+    'auto_invoice_scanner',
+]
+
+HEAVY_MODULES = ['cv2', 'numpy', 'pytesseract', 'PIL', 'httpx', 'h2']
+
+# Runs in a fresh interpreter: import the module, report elapsed time and which heavy modules got loaded
+_PROBE = """
+import sys, time, json, threading
+started = time.perf_counter()
+try:
+    __import__({module!r})
+    error = None
+except BaseException as e:
+    error = f"{{type(e).__name__}}: {{e}}"
+elapsed = time.perf_counter() - started
+print(json.dumps({{'elapsed': elapsed, 'error': error,
+                  'heavy': [m for m in {heavy!r} if m in sys.modules],
+                  'threads': [t.name for t in threading.enumerate() if t is not threading.main_thread()]}}))
+"""
+
+
+def probe(module):
+    """Import module in a fresh interpreter and return the probe's report"""
+    code = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    lines = result.stdout.strip().splitlines()
+    if not lines:
+        return {'elapsed': None, 'error': result.stderr.strip()[-300:] or 'no output', 'heavy': [], 'threads': []}
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of Sapier entry points")
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    eager = threaded = failed = False
+    print(f"{'module':<24} {'median':>9} {'min':>9}  heavy modules loaded")
+    print("-" * 70)
+    for module in args.modules:
+        reports = [probe(module) for _ in range(args.runs)]
+        errors = [r['error'] for r in reports if r['error']]
+        timings = [r['elapsed'] for r in reports if r['elapsed'] is not None]
+        heavy = sorted({m for r in reports for m in r['heavy']})
+        threads = sorted({t for r in reports for t in r['threads']})
+        eager = eager or bool(heavy)
+        threaded = threaded or bool(threads)
+
+        if errors:
+            failed = True
+            print(f"{module:<24} ⚠️  import failed: {errors[0]}")
+        elif timings:
+            print(f"{module:<24} {statistics.median(timings) * 1000:>7.1f}ms {min(timings) * 1000:>7.1f}ms  "
+                  f"{', '.join(heavy) or '-'}")
+            if threads:
+                print(f"{'':<24} threads started at import: {', '.join(threads)}")
+
+    if failed:
+        print("\n⚠️  Some entry points could not be imported (missing dependencies?); their timings are not shown")
+    if eager:
+        print("\n❌ Heavy modules are imported at startup; move those imports into the functions that use them")
+    if threaded:
+        print("\n❌ Threads are started at import time; start them from main() or on first use")
+    if eager or threaded:
+        return 1
+    print("\n✅ No heavy modules imported or threads started at startup")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Invoice OCR
+Preprocessing + Tesseract OCR for invoice photos, in-process or on a pool of worker processes.
+
+With SAPIER_DOC_PREFILTER=1, images that clearly aren't documents are
+dropped by document_prefilter before any full-size decode. The rest are
+cleaned up by ocr_preprocessing (SAPIER_OCR_PREPROCESS, legacy by default)
+before OCR.
+
+OCR can be progressive (SAPIER_OCR_PROGRESSIVE=1): a quick pass reads only
+the header and footer bands of a small copy (SAPIER_OCR_QUICK_SIDE, default
+1000 px), where invoices carry words like "invoice", "receipt" and "total".
+The full-resolution pass runs only if a confidently read word matches an
+invoice keyword, or if the quick pass read too little to tell. It stays off
+by default until `python ocr_benchmark.py <folder> --progressive` shows it
+keeps every invoice that full-page OCR finds.
+
+ParallelOcr runs OCR on SAPIER_OCR_WORKERS processes (default: one per
+core) through process_pool.OrderedProcessPool, so texts come back in
+submission order. Each worker creates its Tesseract engine once (see
+ocr_backends) and reuses it for every image it handles. Workers run
+Tesseract and OpenCV single-threaded so the pool, not nested threads, uses
+the cores.
+"""
+
+import os
+from contextlib import closing
+from ocr_backends import get_ocr_backend
+from ocr_preprocessing import adaptive_preprocess, ocr_max_side, preprocess, preprocess_mode
+from image_decoding import load_reduced
+from document_prefilter import looks_like_document, prefilter_enabled
+from process_pool import OrderedProcessPool, default_workers
+
+INVOICE_KEYWORDS = (
+    'invoice', 'bill', 'receipt', 'total', 'amount', 'due', 'paid',
+    'subtotal', 'tax', 'qty', 'quantity', 'price', 'cost', 'payment',
+    'invoice#', 'inv#', 'receipt#', 'bill#', 'date', 'customer'
+)
+
+# Quick pass: share of the page height read from the top and from the bottom
+HEADER_BAND = 0.35
+FOOTER_BAND = 0.30
+
+# Words below this confidence don't count as keyword hits
+QUICK_MIN_CONFIDENCE = 50
+
+# With fewer confident words than this the quick pass is inconclusive
+QUICK_MIN_WORDS = 5
+
+# Distinct keywords full-page text needs to count as an invoice
+INVOICE_MIN_KEYWORDS = 3
+
+
+def default_ocr_workers():
+    """Number of OCR processes (SAPIER_OCR_WORKERS overrides; 1 = OCR in this process)"""
+    return default_workers('SAPIER_OCR_WORKERS')
+
+
+def load_for_ocr(image_path, mode=None):
+    """Decode and preprocess an image for OCR; returns (binary image, decisions) or (None, None)"""
+    import cv2  # Deferred so importing this module doesn't load OpenCV
+    mode = mode or preprocess_mode()
+
+    if mode == 'legacy':
+        image = cv2.imread(image_path)
+        gray = None if image is None else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        # Big photos are decoded straight to a reduced size; preprocessing picks the final scale
+        gray, _ = load_reduced(image_path, ocr_max_side())
+    if gray is None:
+        return None, None
+
+    return preprocess(gray, mode)
+
+
+def progressive_enabled():
+    return os.getenv('SAPIER_OCR_PROGRESSIVE', '0') == '1'
+
+
+def is_invoice_text(text, keywords=INVOICE_KEYWORDS):
+    """True if full-page OCR text mentions enough invoice keywords"""
+    if not text:
+        return False
+    text_lower = text.lower()
+    return sum(1 for keyword in keywords if keyword in text_lower) >= INVOICE_MIN_KEYWORDS
+
+
+def quick_bands(image_path, max_side=None):
+    """Header and footer bands of a small preprocessed copy, stacked into one image (or None)"""
+    import numpy as np
+    max_side = max_side or int(os.getenv('SAPIER_OCR_QUICK_SIDE', '1000'))
+    gray, _ = load_reduced(image_path, max_side)
+    if gray is None:
+        return None
+
+    binary, _ = adaptive_preprocess(gray, max_side=max_side)
+    height, width = binary.shape[:2]
+    header = binary[:int(height * HEADER_BAND)]
+    footer = binary[height - int(height * FOOTER_BAND):]
+    gap = np.full((20, width), 255, dtype=binary.dtype)
+    return np.vstack((header, gap, footer))
+
+
+def quick_scan(image_path, keywords=INVOICE_KEYWORDS):
+    """
+    Cheap OCR of the header/footer bands.
+    Returns (keyword hits, confident word count), or None if the image can't be decoded.
+    """
+    bands = quick_bands(image_path)
+    if bands is None:
+        return None
+
+    words = [word.lower() for word, confidence in get_ocr_backend().image_to_words(bands)
+             if confidence >= QUICK_MIN_CONFIDENCE]
+    hits = {keyword for keyword in keywords for word in words if keyword in word}
+    return len(hits), len(words)
+
+
+def is_invoice_candidate(image_path):
+    """False only when the quick pass read enough text and none of it looked like an invoice"""
+    result = quick_scan(image_path)
+    if result is None:
+        return True
+    hits, words = result
+    return hits >= 1 or words < QUICK_MIN_WORDS
+
+
+def extract_text(image_path, mode=None, prefilter=None, progressive=None):
+    """
+    Preprocess an image and OCR it with this thread's engine ("" if it can't be decoded).
+    Returns None without full-resolution OCR when the image is ruled out early: the
+    prefilter finds it isn't a document, or the quick pass finds no invoice keywords.
+    """
+    prefilter = prefilter_enabled() if prefilter is None else prefilter
+    if prefilter and not looks_like_document(image_path):
+        return None
+
+    progressive = progressive_enabled() if progressive is None else progressive
+    if progressive and not is_invoice_candidate(image_path):
+        return None
+
+    image, _ = load_for_ocr(image_path, mode)
+    if image is None:
+        return ""
+
+    # Extract text using this thread's Tesseract engine (reused across images)
+    return get_ocr_backend().image_to_string(image).strip()
+
+
+def _init_worker():
+    # One image per process at a time: keep Tesseract/OpenCV from spawning their own threads
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    import cv2
+    cv2.setNumThreads(1)
+    get_ocr_backend()
+
+
+class ParallelOcr:
+    def __init__(self, workers=None):
+        self.workers = workers or default_ocr_workers()
+        self._pool = OrderedProcessPool(self.workers, _init_worker)
+
+    def stream(self, image_paths):
+        """Yield (image_path, text_or_exception) in input order"""
+        with closing(self._pool.stream(extract_text, ((path, path) for path in image_paths))) as results:
+            for image_path, text, _ in results:
+                yield image_path, text
+
+    def close(self):
+        """Shut the worker processes down"""
+        self._pool.close()
@@ -6,19 +6,27 @@ Send invoice details to Telegram with a single click.
 
 import os
 import sys
-import requests
 import json
+import asyncio
 from datetime import datetime
 from dotenv import load_dotenv
+from telegram_client import TelegramError, get_client
 
 # Load environment variables
 load_dotenv()
 
+# Characters with a meaning in Telegram's (legacy) Markdown
+MARKDOWN_SPECIAL = '_*`['
+
+
+def escape_markdown(text):
+    """Escape text so Telegram's Markdown parse mode shows it verbatim"""
+    return ''.join('\\' + ch if ch in MARKDOWN_SPECIAL else ch for ch in text)
+
 class InvoiceSender:
     def __init__(self):
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.chat_id = os.getenv('TELEGRAM_ADMIN_USER_ID')
-        self.api_base_url = f"https://api.telegram.org/bot{self.bot_token}"
         
         if not self.bot_token:
             print("❌ TELEGRAM_BOT_TOKEN not found in .env file")
@@ -27,6 +35,8 @@ class InvoiceSender:
         if not self.chat_id:
             print("❌ TELEGRAM_ADMIN_USER_ID not found in .env file")
             sys.exit(1)
+        
+        self.telegram = get_client(self.bot_token)
     
     def format_invoice(self, invoice_data):
         """Format invoice data for Telegram message"""
@@ -103,39 +113,48 @@ class InvoiceSender:
         message += f"🕐 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
         message += "━" * 40
         
-        return message
+        # The message has no markup of its own; file names like IMG_1234.jpg must not become entities
+        return escape_markdown(message)
+    
+    def post_invoice(self, invoice_data, chat_id=None):
+        """Send an invoice (to the admin chat by default), raising TelegramError if Telegram rejects it"""
+        self.telegram.send_message(chat_id or self.chat_id, self.format_invoice(invoice_data), parse_mode='Markdown')
+        print("✅ Invoice sent to Telegram successfully!")
     
     def send_invoice(self, invoice_data):
         """Send invoice to Telegram"""
         try:
-            formatted_message = self.format_invoice(invoice_data)
-            
-            url = f"{self.api_base_url}/sendMessage"
-            data = {
-                'chat_id': self.chat_id,
-                'text': formatted_message,
-                'parse_mode': 'Markdown'
-            }
-            
-            response = requests.post(url, data=data, timeout=10)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('ok'):
-                    print("✅ Invoice sent to Telegram successfully!")
-                    return True
-                else:
-                    print(f"❌ Failed to send invoice: {result}")
-                    return False
-            else:
-                print(f"❌ HTTP Error: {response.status_code}")
-                print(response.text)
-                return False
+            self.post_invoice(invoice_data)
+            return True
                 
+        except TelegramError as e:
+            print(f"❌ Failed to send invoice: {e}")
+            return False
         except Exception as e:
             print(f"❌ Error sending invoice: {e}")
             return False
     
+    async def send_invoices_async(self, invoices, chat_ids=None, client=None):
+        """Send several invoices (to one or more chats) concurrently, returning how many were delivered"""
+        chat_ids = chat_ids or [self.chat_id]
+        
+        async def send_all(telegram):
+            results = await asyncio.gather(
+                *(telegram.send_message(chat_id, self.format_invoice(invoice), parse_mode='Markdown')
+                  for invoice in invoices for chat_id in chat_ids),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"❌ Failed to send invoice: {result}")
+            return sum(1 for result in results if not isinstance(result, Exception))
+        
+        if client is not None:
+            return await send_all(client)
+        from telegram_async_client import AsyncTelegramClient  # Deferred: loads httpx/h2
+        async with AsyncTelegramClient(self.bot_token) as telegram:
+            return await send_all(telegram)
+    
     def send_sample_invoice(self):
         """Send a sample invoice for testing"""
         sample_invoice = {
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Job Manager
+Bounded background pool for long-running scans (face/photo sends, invoice scans).
+
+Callers get a Job back immediately and follow it by id. A job function
+receives a progress(**fields) callback; the fields end up in job.progress,
+and every change bumps job.version, so pollers and server-sent-event
+streams can wait for the next change instead of spinning. Submitting a job
+with the same dedupe key as one still queued or running returns the existing
+job. Once SAPIER_JOB_QUEUE jobs are waiting, further submissions are refused.
+"""
+
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are already waiting"""
+
+
+class Job:
+    def __init__(self, kind, params, dedupe_key=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = dict(params or {})
+        self.dedupe_key = dedupe_key
+        self.status = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+        self.listeners = []
+
+    @property
+    def active(self):
+        return self.status in ACTIVE_STATUSES
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'version': self.version,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers=None, max_queued=None, keep_finished=100):
+        self.max_workers = max_workers or int(os.getenv('SAPIER_JOB_WORKERS', '2'))
+        self.max_queued = max_queued or int(os.getenv('SAPIER_JOB_QUEUE', '20'))
+        self.keep_finished = keep_finished
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='sapier-job')
+        self._changed = threading.Condition()
+        self._jobs = OrderedDict()
+
+    def submit(self, kind, func, params=None, dedupe_key=None, listener=None):
+        """
+        Queue func(progress) to run in the background.
+        Returns (job, created); created is False when an identical active job was reused.
+        listener(job) is called after every change to the job, on the thread that made the change
+        (usually the job itself), so it must not block: hand slow work such as HTTP calls off.
+        """
+        with self._changed:
+            if dedupe_key is not None:
+                for job in self._jobs.values():
+                    if job.active and job.dedupe_key == dedupe_key:
+                        if listener is not None:
+                            job.listeners.append(listener)
+                        return job, False
+
+            if sum(1 for job in self._jobs.values() if job.status == QUEUED) >= self.max_queued:
+                raise JobQueueFull(f"{self.max_queued} jobs are already waiting")
+
+            job = Job(kind, params, dedupe_key)
+            if listener is not None:
+                job.listeners.append(listener)
+            self._jobs[job.id] = job
+            self._prune()
+
+        self._executor.submit(self._run, job, func)
+        return job, True
+
+    def get(self, job_id):
+        """Return the job with this id, or None"""
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Snapshots of all known jobs, oldest first"""
+        with self._changed:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def wait_for_change(self, job_id, since_version=-1, timeout=None):
+        """
+        Block until the job's version moves past since_version (or it finishes), then return a snapshot.
+        Returns None for an unknown job; on timeout the current snapshot is returned.
+        """
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._changed.wait_for(lambda: job.version > since_version or not job.active, timeout)
+            return job.to_dict()
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes and return its snapshot (None for an unknown job)"""
+        with self._changed:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            self._changed.wait_for(lambda: not job.active, timeout)
+            return job.to_dict()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def _update(self, job, **changes):
+        with self._changed:
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.version += 1
+            self._changed.notify_all()
+            listeners = list(job.listeners)
+
+        for listener in listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"⚠️  Job listener failed for {job.id}: {e}")
+
+    def _progress(self, job, fields):
+        with self._changed:
+            progress = {**job.progress, **fields}
+        self._update(job, progress=progress)
+
+    def _run(self, job, func):
+        self._update(job, status=RUNNING, started=time.time())
+        try:
+            result = func(lambda **fields: self._progress(job, fields))
+        except Exception as e:
+            self._update(job, status=FAILED, error=str(e), finished=time.time())
+        else:
+            self._update(job, status=DONE, result=result, finished=time.time())
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond keep_finished (called with the lock held)
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+OCR Backends
+Pluggable Tesseract engines used by the invoice scanner.
+
+- tesserocr: binds libtesseract in-process. The engine and its language data
+  are loaded once per thread and reused for every image.
+- pytesseract: runs the tesseract CLI once per image (writes a temp file and
+  reloads the language data every time). This is the fallback when tesserocr
+  isn't installed.
+
+SAPIER_OCR_BACKEND picks one: auto (default), tesserocr or pytesseract.
+SAPIER_OCR_LANG sets the language (default eng). SAPIER_TESSDATA points
+tesserocr at a tessdata directory. Tesseract engines are not thread-safe, so
+get_ocr_backend() hands each thread (and each worker process) its own engine.
+"""
+
+import os
+import threading
+
+DEFAULT_PSM = 6  # Assume a single uniform block of text
+
+_local = threading.local()
+_fallback_warned = False
+
+
+class PytesseractBackend:
+    name = 'pytesseract'
+
+    def __init__(self, lang='eng'):
+        import pytesseract  # Deferred: only loaded once there is something to OCR
+        self._pytesseract = pytesseract
+        self.lang = lang
+
+    def image_to_string(self, image, psm=DEFAULT_PSM):
+        """OCR a grayscale or BGR image array"""
+        return self._pytesseract.image_to_string(image, lang=self.lang, config=f'--psm {psm}')
+
+    def image_to_words(self, image, psm=DEFAULT_PSM):
+        """OCR an image array; returns [(word, confidence 0-100)]"""
+        data = self._pytesseract.image_to_data(image, lang=self.lang, config=f'--psm {psm}',
+                                               output_type=self._pytesseract.Output.DICT)
+        return [(word.strip(), float(conf)) for word, conf in zip(data['text'], data['conf'])
+                if word.strip() and float(conf) >= 0]
+
+    def close(self):
+        pass
+
+
+class TesserocrBackend:
+    name = 'tesserocr'
+
+    def __init__(self, lang='eng', tessdata=None):
+        import tesserocr
+        self.lang = lang
+        kwargs = {'lang': lang, 'psm': DEFAULT_PSM}
+        if tessdata:
+            kwargs['path'] = tessdata
+        self.api = tesserocr.PyTessBaseAPI(**kwargs)
+        self._psm = DEFAULT_PSM
+
+    def _set_image(self, image):
+        height, width = image.shape[:2]
+        channels = 1 if image.ndim == 2 else image.shape[2]
+        self.api.SetImageBytes(image.tobytes(), width, height, channels, width * channels)
+
+    def _set_psm(self, psm):
+        if psm != self._psm:
+            self.api.SetPageSegMode(psm)
+            self._psm = psm
+
+    def image_to_string(self, image, psm=DEFAULT_PSM):
+        """OCR a grayscale or BGR image array"""
+        self._set_psm(psm)
+        self._set_image(image)
+        return self.api.GetUTF8Text()
+
+    def image_to_words(self, image, psm=DEFAULT_PSM):
+        """OCR an image array; returns [(word, confidence 0-100)]"""
+        self._set_psm(psm)
+        self._set_image(image)
+        self.api.Recognize()
+        return [(word.strip(), float(conf)) for word, conf in self.api.MapWordConfidences() if word.strip()]
+
+    def close(self):
+        self.api.End()
+
+
+def create_ocr_backend(name=None, lang=None):
+    """Create an OCR engine; 'auto' prefers tesserocr and falls back to pytesseract"""
+    global _fallback_warned
+    name = (name or os.getenv('SAPIER_OCR_BACKEND', 'auto')).lower()
+    lang = lang or os.getenv('SAPIER_OCR_LANG', 'eng')
+
+    if name == 'pytesseract':
+        return PytesseractBackend(lang)
+    if name not in ('auto', 'tesserocr'):
+        raise ValueError(f"Unknown OCR backend: {name}")
+
+    try:
+        return TesserocrBackend(lang, os.getenv('SAPIER_TESSDATA'))
+    except ImportError:
+        if name == 'tesserocr':
+            raise
+        reason = "tesserocr is not installed"
+    except RuntimeError as e:  # e.g. missing language data
+        if name == 'tesserocr':
+            raise
+        reason = f"tesserocr failed to start: {e}"
+
+    if not _fallback_warned:
+        _fallback_warned = True
+        print(f"ℹ️  {reason}; using pytesseract (one tesseract process per image)")
+    return PytesseractBackend(lang)
+
+
+def get_ocr_backend():
+    """Return this thread's OCR engine, creating it on first use"""
+    backend = getattr(_local, 'backend', None)
+    if backend is None:
+        backend = _local.backend = create_ocr_backend()
+    return backend
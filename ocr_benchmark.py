@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+OCR Preprocessing Benchmark
+Compares the legacy (NLM + Otsu) and adaptive preprocessing pipelines on a
+folder of images: time spent decoding + preprocessing, time spent in OCR,
+and text accuracy.
+
+Accuracy is the character similarity (difflib ratio, whitespace-normalized)
+against a ground-truth <image name>.txt when one exists next to the image
+or in --truth-dir. Otherwise it is measured against the legacy pipeline's
+output, so it shows agreement with the current behaviour. Legacy stays the
+default pipeline until this shows comparable accuracy on labelled invoices.
+
+With --prefilter it instead measures the document prefilter on a labelled
+sample: a folder with documents/ and other/ subfolders. It reports the
+false-negative rate (documents that would skip OCR) and the false-positive
+rate (other images still sent to OCR) at a range of thresholds.
+
+With --progressive it checks the progressive quick pass against full-page
+OCR: every image is OCRed in full, and its recall is the share of invoices
+found that way which the quick pass would also have let through.
+
+Usage:
+    python ocr_benchmark.py ~/Pictures/receipts
+    python ocr_benchmark.py receipts --limit 50 --truth-dir receipts/truth
+    python ocr_benchmark.py receipts --no-ocr      # preprocessing cost only
+    python ocr_benchmark.py labelled --prefilter   # documents/ vs other/
+    python ocr_benchmark.py receipts --progressive # quick-pass recall
+"""
+
+import os
+import sys
+import time
+import argparse
+import difflib
+import statistics
+from collections import Counter
+from invoice_ocr import extract_text, is_invoice_candidate, is_invoice_text, load_for_ocr
+from document_prefilter import document_score, prefilter_threshold
+from ocr_backends import get_ocr_backend
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
+MODES = ('legacy', 'adaptive')
+PREFILTER_LABELS = ('documents', 'other')
+
+
+def normalize(text):
+    return ' '.join(text.split()).lower()
+
+
+def similarity(text, reference):
+    return difflib.SequenceMatcher(None, normalize(text), normalize(reference), autojunk=False).ratio()
+
+
+def find_truth(image_path, truth_dir):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    for folder in filter(None, (truth_dir, os.path.dirname(image_path))):
+        candidate = os.path.join(folder, stem + '.txt')
+        if os.path.exists(candidate):
+            with open(candidate, encoding='utf-8') as f:
+                return f.read()
+    return None
+
+
+def run(image_path, mode, ocr):
+    """Returns (preprocess seconds, ocr seconds, text, decisions)"""
+    started = time.perf_counter()
+    image, info = load_for_ocr(image_path, mode)
+    prepared = time.perf_counter()
+    if image is None:
+        return prepared - started, 0.0, "", {}
+    text = get_ocr_backend().image_to_string(image).strip() if ocr else ""
+    return prepared - started, time.perf_counter() - prepared, text, info
+
+
+def list_images(folder, limit):
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )[:limit]
+
+
+def benchmark_prefilter(folder, limit):
+    """Score a labelled sample and report error rates per threshold"""
+    scores = {}
+    timings = []
+    for label in PREFILTER_LABELS:
+        path = os.path.join(folder, label)
+        if not os.path.isdir(path):
+            print(f"❌ Expected {path} (labelled sample: documents/ and other/)")
+            return 1
+        scores[label] = []
+        for image_path in list_images(path, limit):
+            started = time.perf_counter()
+            score, _ = document_score(image_path)
+            timings.append(time.perf_counter() - started)
+            if score is not None:
+                scores[label].append((score, os.path.basename(image_path)))
+
+    documents, other = scores['documents'], scores['other']
+    if not documents or not other:
+        print("❌ Both documents/ and other/ need images")
+        return 1
+
+    print(f"{len(documents)} documents, {len(other)} other images, "
+          f"median {statistics.median(timings) * 1000:.0f}ms per image")
+    print(f"\n{'threshold':>9} {'false negatives':>16} {'false positives':>16}")
+    configured = prefilter_threshold()
+    for threshold in sorted({0.2, 0.3, 0.4, 0.45, 0.5, 0.6, configured}):
+        missed = sum(1 for score, _ in documents if score < threshold)
+        kept = sum(1 for score, _ in other if score >= threshold)
+        marker = '  <- configured' if threshold == configured else ''
+        print(f"{threshold:>9.2f} {missed:>6}/{len(documents):<3} ({missed / len(documents):>4.0%}) "
+              f"{kept:>6}/{len(other):<3} ({kept / len(other):>4.0%}){marker}")
+
+    missed = sorted(item for item in documents if item[0] < configured)
+    if missed:
+        print("\nDocuments that would skip OCR: " + ', '.join(f"{name} ({score:.2f})" for score, name in missed))
+    return 0
+
+
+def benchmark_progressive(folder, limit):
+    """Report how many invoices found by full-page OCR the quick pass would keep"""
+    images = list_images(folder, limit)
+    if not images:
+        print(f"❌ No images found in {folder}")
+        return 1
+
+    full_times, quick_times = [], []
+    invoices, kept, missed, skipped = 0, 0, [], 0
+    for i, image_path in enumerate(images):
+        print(f"[{i+1}/{len(images)}] {os.path.basename(image_path)}")
+        started = time.perf_counter()
+        is_invoice = is_invoice_text(extract_text(image_path, prefilter=False, progressive=False))
+        full_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        candidate = is_invoice_candidate(image_path)
+        quick_times.append(time.perf_counter() - started)
+
+        if is_invoice:
+            invoices += 1
+            if candidate:
+                kept += 1
+            else:
+                missed.append(os.path.basename(image_path))
+        elif not candidate:
+            skipped += 1
+
+    print(f"\nFull OCR median {statistics.median(full_times) * 1000:.0f}ms, "
+          f"quick pass median {statistics.median(quick_times) * 1000:.0f}ms")
+    if invoices:
+        print(f"Recall: {kept}/{invoices} invoices ({kept / invoices:.0%}) pass the quick pass")
+    else:
+        print("ℹ️  Full OCR found no invoices; recall can't be measured on this folder")
+    print(f"Full OCR skipped for {skipped}/{len(images) - invoices} non-invoice images")
+    if missed:
+        print("Invoices the quick pass would skip: " + ', '.join(missed))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OCR preprocessing pipelines")
+    parser.add_argument('folder')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--truth-dir')
+    parser.add_argument('--no-ocr', action='store_true', help="only time decoding + preprocessing")
+    parser.add_argument('--prefilter', action='store_true',
+                        help="measure the document prefilter on documents/ and other/ subfolders")
+    parser.add_argument('--progressive', action='store_true',
+                        help="measure the progressive quick pass's recall against full-page OCR")
+    args = parser.parse_args()
+
+    if args.prefilter:
+        return benchmark_prefilter(args.folder, args.limit)
+    if args.progressive:
+        return benchmark_progressive(args.folder, args.limit)
+
+    images = list_images(args.folder, args.limit)
+    if not images:
+        print(f"❌ No images found in {args.folder}")
+        return 1
+
+    ocr = not args.no_ocr
+    stats = {mode: {'prep': [], 'ocr': [], 'accuracy': []} for mode in MODES}
+    decisions = Counter()
+    for i, image_path in enumerate(images):
+        print(f"[{i+1}/{len(images)}] {os.path.basename(image_path)}")
+        texts = {}
+        for mode in MODES:
+            prep, ocr_time, texts[mode], info = run(image_path, mode, ocr)
+            stats[mode]['prep'].append(prep)
+            stats[mode]['ocr'].append(ocr_time)
+            if mode == 'adaptive' and info:
+                decisions[f"denoise={info['denoise']}"] += 1
+                decisions[f"threshold={info['threshold']}"] += 1
+
+        if ocr:
+            reference = find_truth(image_path, args.truth_dir)
+            for mode in MODES:
+                if reference is not None:
+                    stats[mode]['accuracy'].append(similarity(texts[mode], reference))
+                elif mode != 'legacy':
+                    stats[mode]['accuracy'].append(similarity(texts[mode], texts['legacy']))
+
+    print()
+    print(f"{'pipeline':<10} {'prep median':>12} {'ocr median':>11} {'total mean':>11} {'accuracy':>9}")
+    print("-" * 57)
+    for mode in MODES:
+        s = stats[mode]
+        total = statistics.mean(p + o for p, o in zip(s['prep'], s['ocr']))
+        accuracy = f"{statistics.mean(s['accuracy']):.3f}" if s['accuracy'] else '-'
+        print(f"{mode:<10} {statistics.median(s['prep']) * 1000:>10.0f}ms "
+              f"{statistics.median(s['ocr']) * 1000:>9.0f}ms {total * 1000:>9.0f}ms {accuracy:>9}")
+
+    print(f"\nAdaptive decisions: {', '.join(f'{k}: {v}' for k, v in sorted(decisions.items()))}")
+    if ocr and not any(find_truth(path, args.truth_dir) is not None for path in images):
+        print("ℹ️  No ground truth found; adaptive accuracy is agreement with the legacy output")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
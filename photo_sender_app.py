@@ -4,14 +4,47 @@ Photo Sender App - Web Interface
 Simple web app with buttons to send photos via Telegram bot.
 """
 
-from flask import Flask, render_template_string, request, jsonify, redirect, url_for
+from flask import Flask, Response, render_template_string, request, jsonify, redirect, url_for
 import os
 import sys
+import json
 import threading
 from simple_face_finder import SimpleFaceFinder
+from job_manager import JobManager, JobQueueFull
 
 app = Flask(__name__)
 
+# Sends run as background jobs on a bounded pool; the browser follows them by id
+jobs = JobManager()
+
+# One long-lived engine for every request: the cascade, catalog, detection cache and
+# Telegram connections are set up once. It caps its own concurrent face scans
+# (SAPIER_MAX_CONCURRENT_SCANS), so extra jobs queue instead of competing for CPU.
+# It is created on first use, never at import: detection worker processes started
+# with spawn (Windows, macOS) re-import this module and must not build one each.
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """The shared scan engine, created on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SimpleFaceFinder()
+        return _engine
+
+def warm_up():
+    """Load OpenCV and refresh the image catalog off the request path"""
+    try:
+        engine = get_engine()
+        engine.face_cascade
+        engine.find_image_files()
+    except Exception as e:
+        print(f"⚠️  Catalog warm-up failed: {e}")
+
+SEND_MODES = {'recent', 'test', 'faces', 'sara'}
+MAX_SEND_COUNT = 50
+
 # HTML template for the web interface
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -200,10 +233,22 @@ HTML_TEMPLATE = """
             }
         }
 
+        function describeProgress(job) {
+            const p = job.progress || {};
+            if (job.status === 'queued') {
+                return '⏳ Waiting for a free worker...';
+            }
+            const parts = [];
+            if (p.checked !== undefined) parts.push(`checked ${p.checked}/${p.total}`);
+            if (p.found !== undefined) parts.push(`found ${p.found}`);
+            if (p.sent !== undefined) parts.push(`sent ${p.sent}`);
+            return `🔄 ${p.stage || 'Processing'}... ${parts.join(', ')}`;
+        }
+
         function sendPhotos(mode, count) {
-            showStatus(`🔄 Processing... This may take a few minutes`, 'loading');
+            showStatus(`🔄 Starting...`, 'loading');
             
-            // Disable all buttons during processing
+            // Disable all buttons while the request is being queued
             const buttons = document.querySelectorAll('.btn');
             buttons.forEach(btn => btn.disabled = true);
             
@@ -219,11 +264,28 @@ HTML_TEMPLATE = """
             })
             .then(response => response.json())
             .then(data => {
-                if (data.success) {
-                    showStatus(`✅ Success! Sent ${data.sent_count} photos to Telegram`, 'success');
-                } else {
+                if (!data.success) {
                     showStatus(`❌ Error: ${data.error}`, 'error');
+                    return;
                 }
+                // Follow the job until it finishes
+                const events = new EventSource(data.events_url);
+                events.onmessage = (event) => {
+                    const job = JSON.parse(event.data);
+                    if (job.status === 'done') {
+                        showStatus(`✅ Success! Sent ${job.result} photos to Telegram`, 'success');
+                        events.close();
+                    } else if (job.status === 'failed') {
+                        showStatus(`❌ Error: ${job.error}`, 'error');
+                        events.close();
+                    } else {
+                        showStatus(describeProgress(job), 'loading');
+                    }
+                };
+                events.onerror = () => {
+                    events.close();
+                    showStatus(`❌ Lost track of job ${data.job_id}`, 'error');
+                };
             })
             .catch(error => {
                 showStatus(`❌ Error: ${error}`, 'error');
@@ -247,49 +309,73 @@ HTML_TEMPLATE = """
 def index():
     return render_template_string(HTML_TEMPLATE)
 
+def run_send_job(mode, count, progress):
+    """Job body: run one send on the shared engine and return the number of photos actually sent"""
+    engine = get_engine()
+    if mode in ('recent', 'test'):
+        return engine.send_recent_photos(max_images=count, progress=progress)
+    return engine.find_and_send_face_images(max_images=count, search_mode=mode, progress=progress)
+
 @app.route('/send_photos', methods=['POST'])
 def send_photos():
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'recent')
+    if mode not in SEND_MODES:
+        return jsonify({'success': False, 'error': 'Invalid mode'}), 400
     try:
-        data = request.json
-        mode = data.get('mode', 'recent')
-        count = data.get('count', 5)
-        
-        finder = SimpleFaceFinder()
-        
-        def run_in_background():
-            global result_data
-            try:
-                if mode == 'recent' or mode == 'test':
-                    finder.send_recent_photos(max_images=count)
-                    result_data = {'success': True, 'sent_count': count}
-                elif mode == 'faces':
-                    finder.find_and_send_face_images(max_images=count, search_mode="faces")
-                    result_data = {'success': True, 'sent_count': count}
-                elif mode == 'sara':
-                    finder.find_and_send_face_images(max_images=count, search_mode="sara")
-                    result_data = {'success': True, 'sent_count': count}
-                else:
-                    result_data = {'success': False, 'error': 'Invalid mode'}
-            except Exception as e:
-                result_data = {'success': False, 'error': str(e)}
-        
-        # Run in background thread (simplified response)
-        thread = threading.Thread(target=run_in_background)
-        thread.start()
-        thread.join(timeout=60)  # Wait up to 60 seconds
-        
-        # For simplicity, return success (the actual sending happens in background)
-        return jsonify({
-            'success': True,
-            'sent_count': count,
-            'message': f'Started sending {count} photos in {mode} mode'
-        })
-        
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        })
+        count = int(data.get('count', 5))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'count must be a number'}), 400
+    if mode == 'test':
+        count = 3
+    count = max(1, min(count, MAX_SEND_COUNT))
+    
+    try:
+        # Identical requests while one is still queued or running share that job
+        job, created = jobs.submit(mode, lambda progress: run_send_job(mode, count, progress),
+                                   params={'mode': mode, 'count': count}, dedupe_key=(mode, count))
+    except JobQueueFull as e:
+        return jsonify({'success': False, 'error': f'Too many requests queued: {e}'}), 429
+    
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'deduplicated': not created,
+        'status_url': url_for('job_status', job_id=job.id),
+        'events_url': url_for('job_events', job_id=job.id),
+        'message': f'Queued sending {count} photos in {mode} mode'
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Server-sent events: one message per job change, ending when the job finishes"""
+    if jobs.get(job_id) is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    
+    def stream():
+        version = -1
+        while True:
+            snapshot = jobs.wait_for_change(job_id, version, timeout=15)
+            if snapshot is None:
+                return
+            if snapshot['version'] == version:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                continue
+            version = snapshot['version']
+            yield f"data: {json.dumps(snapshot)}\n\n"
+            if snapshot['status'] in ('done', 'failed'):
+                return
+    
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 if __name__ == '__main__':
     print("🌐 Starting Sapier Photo Sender App...")
@@ -297,4 +383,7 @@ if __name__ == '__main__':
     print("🔗 Open: http://localhost:5000")
     print("=" * 40)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    threading.Thread(target=warm_up, daemon=True, name='catalog-warm-up').start()
+    
+    # The reloader would import this module twice and build a second engine
+    app.run(debug=True, use_reloader=False, host='0.0.0.0', port=5000)
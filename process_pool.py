@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Process Pool
+Ordered streaming over a pool of worker processes, shared by face detection
+and OCR.
+
+OrderedProcessPool keeps a bounded window of items in flight (workers x
+window_per_worker) and yields results in submission order, so callers that
+feed images newest-first also consume them newest-first. Closing the result
+stream cancels whatever is still queued. The pool is started on first use.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def default_workers(env_name):
+    """Number of worker processes (env_name overrides; default: one per core)"""
+    configured = os.getenv(env_name)
+    if configured:
+        return max(1, int(configured))
+    return os.cpu_count() or 1
+
+
+class OrderedProcessPool:
+    def __init__(self, workers, initializer=None, window_per_worker=2):
+        self.workers = workers
+        self.initializer = initializer
+        self.window = workers * window_per_worker
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer)
+        return self._executor
+
+    def stream(self, func, items, args=(), lookup=None):
+        """
+        Run func(value, *args) for (key, value) items and yield results in input order.
+
+        Yields (key, result_or_exception, computed). lookup(key, value) may return
+        a result for items that need no work (e.g. cache hits); those are yielded
+        in place with computed=False without touching the pool.
+        """
+        pool = self._pool()
+        pending = deque()
+        in_flight = 0
+        items = iter(items)
+        exhausted = False
+
+        try:
+            while True:
+                # Keep up to `window` jobs outstanding (and a bounded number of lookups buffered)
+                while not exhausted and in_flight < self.window and len(pending) < self.window * 4:
+                    try:
+                        key, value = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    result = lookup(key, value) if lookup else None
+                    if result is not None:
+                        pending.append((key, result, None))
+                    else:
+                        pending.append((key, None, pool.submit(func, value, *args)))
+                        in_flight += 1
+
+                if not pending:
+                    return
+
+                key, result, job = pending.popleft()
+                if job is not None:
+                    in_flight -= 1
+                    try:
+                        result = job.result()
+                    except Exception as e:
+                        result = e
+                yield key, result, job is not None
+        finally:
+            for _, _, job in pending:
+                if job is not None:
+                    job.cancel()
+
+    def close(self):
+        """Shut the worker processes down"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
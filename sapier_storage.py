@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Sapier Local Storage
+Shared location and SQLite settings for Sapier's on-disk caches.
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import tempfile
+
+
+def data_dir():
+    """Return the directory used for Sapier's local state (created on demand)"""
+    path = os.getenv('SAPIER_DATA_DIR') or os.path.join(os.path.expanduser("~"), ".sapier")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_path(filename):
+    """Return the full path of a file inside the Sapier data directory"""
+    return os.path.join(data_dir(), filename)
+
+
+def connect(db_path):
+    """Open a SQLite database tuned for a small local cache"""
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+def file_sha1(path, chunk_size=1024 * 1024):
+    """Return the SHA-1 hex digest of a file's contents"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def atomic_write_json(path, data):
+    """Write JSON so readers (and crashes) only ever see the old or the new file, never a partial one"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_json(path, default=None):
+    """Read a JSON file, returning default if it is missing or unreadable"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
@@ -7,26 +7,53 @@ Uses OpenCV's built-in face detection instead of face recognition.
 
 import os
 import sys
-import cv2
-import numpy as np
-import requests
+import json
+import asyncio
+import queue
+import threading
 from datetime import datetime
+from operator import attrgetter
 from dotenv import load_dotenv
-import time
+from image_catalog import ImageCatalog
+from detection_cache import DetectionCache
+from telegram_client import TelegramError, TelegramNetworkError, get_client
+from telegram_file_cache import TelegramFileCache
+from upload_preparation import UploadPreparer
+from telegram_outbox import TelegramOutbox, OutboxSender, default_drain_timeout, file_dedupe_key
+from face_detection import (
+    CASCADE_NAME, DEFAULT_DETECTOR_PARAMS, ParallelFaceDetector,
+    default_detect_workers, default_max_side, detect_faces, keep_small_faces, load_cascade
+)
 
 # Load environment variables
 load_dotenv()
 
+# Telegram allows up to 10 photos per sendMediaGroup album
+MEDIA_GROUP_LIMIT = 10
+
 class SimpleFaceFinder:
     def __init__(self):
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.chat_id = os.getenv('TELEGRAM_ADMIN_USER_ID')
-        self.api_base_url = f"https://api.telegram.org/bot{self.bot_token}"
         
         if not self.bot_token or not self.chat_id:
             print("❌ Telegram configuration missing in .env file")
             sys.exit(1)
         
+        # Pooled, rate-limited Bot API client shared with the other Sapier modules
+        self.telegram = get_client(self.bot_token)
+        
+        # Photos Telegram already has are re-sent by file_id instead of re-uploaded
+        self.file_cache = TelegramFileCache(self.bot_token)
+        
+        # Photos are shrunk before upload; originals can still be sent as documents
+        self.upload_preparer = UploadPreparer()
+        self.send_originals = os.getenv('SAPIER_SEND_ORIGINALS', '0') == '1'
+        
+        # Matches are queued durably so an interrupted run resumes instead of re-sending
+        self.outbox = TelegramOutbox(self.bot_token)
+        self.durable_sends = os.getenv('SAPIER_DURABLE_SENDS', '1') == '1'
+        
         # Common photo folders
         self.photo_folders = [
             os.path.join(os.path.expanduser("~"), "Pictures"),
@@ -37,54 +64,146 @@ class SimpleFaceFinder:
         ]
         
         # Supported image formats
-        self.image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp']
+        self.image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
         
-        # Initialize OpenCV face detector
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        # OpenCV face detector. CascadeClassifier isn't thread-safe, so each thread that
+        # detects in-process gets its own copy, loaded (with OpenCV) on first use
+        self._cascades = threading.local()
+        self.detector_params = dict(DEFAULT_DETECTOR_PARAMS)
         
-    def find_all_images(self):
-        """Find all image files in photo folders"""
-        image_files = []
+        # Photos are decoded at reduced size for detection (0 = full resolution)
+        self.detect_max_side = default_max_side()
         
-        for folder in self.photo_folders:
-            if os.path.exists(folder):
-                print(f"🔍 Scanning folder: {folder}")
-                
-                for root, dirs, files in os.walk(folder):
-                    for file in files:
-                        if any(file.lower().endswith(ext) for ext in self.image_extensions):
-                            full_path = os.path.join(root, file)
-                            image_files.append(full_path)
+        # Worker processes used for bulk detection (1 = detect in this process)
+        self.detect_workers = default_detect_workers()
+        self._parallel_detector = None
+        self._detector_lock = threading.Lock()
+        
+        # Admission control: at most this many CPU-heavy face scans run at once (others wait)
+        self.scan_slots = threading.BoundedSemaphore(int(os.getenv('SAPIER_MAX_CONCURRENT_SCANS', '1')))
+        
+        # Detection results for unchanged files are reused across runs
+        self.detection_cache = DetectionCache()
+        self.detection_key = DetectionCache.params_key({
+            'cascade': CASCADE_NAME,
+            'maxSide': self.detect_max_side,
+            'smallFaces': keep_small_faces(),
+            **self.detector_params
+        })
+        
+        # Persistent catalog so repeated scans only re-list changed folders
+        self.catalog = ImageCatalog()
+        
+    def find_image_files(self):
+        """Find all image files in photo folders, with their size and mtime"""
+        stats = self.catalog.refresh(self.photo_folders, self.image_extensions)
+        if stats['rescanned']:
+            print(f"🔍 Scanned {stats['rescanned']} changed folders ({stats['unchanged']} unchanged)")
+        else:
+            print(f"🗂️  Catalog up to date ({stats['unchanged']} folders unchanged)")
+        
+        image_files = self.catalog.images(self.photo_folders)
         
         print(f"📸 Found {len(image_files)} total images")
         return image_files
     
-    def has_faces(self, image_path):
-        """Check if image contains faces using OpenCV"""
+    def find_all_images(self):
+        """Find all image files in photo folders"""
+        return [image.path for image in self.find_image_files()]
+    
+    @property
+    def face_cascade(self):
+        """The calling thread's face detector"""
+        cascade = getattr(self._cascades, 'cascade', None)
+        if cascade is None:
+            cascade = self._cascades.cascade = load_cascade()
+        return cascade
+    
+    def detect_faces(self, image_path):
+        """Run the OpenCV face detector on an image, returning face boxes"""
+        return detect_faces(image_path, self.face_cascade, self.detector_params, self.detect_max_side)
+    
+    def has_faces(self, image_path, size=None, mtime=None):
+        """Check if image contains faces using OpenCV (cached per file identity)"""
         try:
-            # Read the image
-            img = cv2.imread(image_path)
-            if img is None:
-                return False
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            if size is None or mtime is None:
+                st = os.stat(image_path)
+                size, mtime = st.st_size, st.st_mtime
             
-            # Detect faces
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30)
-            )
+            boxes = self.detection_cache.get(image_path, size, mtime, self.detection_key)
+            if boxes is None:
+                boxes = self.detect_faces(image_path)
+                self.detection_cache.put(image_path, size, mtime, self.detection_key, boxes)
             
-            return len(faces) > 0
+            return len(boxes) > 0
             
         except Exception as e:
             print(f"   ⚠️  Error processing {os.path.basename(image_path)}: {e}")
             return False
     
-    def is_sara_related(self, image_path):
+    def iter_face_results(self, image_files, workers=None):
+        """Yield (ImageFile, boxes) in input order; boxes is an exception if detection failed"""
+        workers = workers or self.detect_workers
+        
+        def cached_boxes(image, image_path):
+            return self.detection_cache.get(image_path, image.size, image.mtime, self.detection_key)
+        
+        if workers <= 1:
+            for image in image_files:
+                try:
+                    boxes = cached_boxes(image, image.path)
+                    if boxes is None:
+                        boxes = self.detect_faces(image.path)
+                        self.detection_cache.put(image.path, image.size, image.mtime, self.detection_key, boxes)
+                except Exception as e:
+                    boxes = e
+                yield image, boxes
+            self.detection_cache.flush()
+            return
+        
+        with self._detector_lock:
+            if self._parallel_detector is None or self._parallel_detector.workers != workers:
+                if self._parallel_detector is not None:
+                    self._parallel_detector.close()
+                self._parallel_detector = ParallelFaceDetector(self.detector_params, workers, self.detect_max_side)
+            detector = self._parallel_detector
+        
+        results = detector.stream(((image, image.path) for image in image_files), lookup=cached_boxes)
+        try:
+            for image, boxes, detected in results:
+                if detected and not isinstance(boxes, Exception):
+                    self.detection_cache.put(image.path, image.size, image.mtime, self.detection_key, boxes)
+                yield image, boxes
+        finally:
+            # Cancels queued detections when the caller stops early
+            results.close()
+            self.detection_cache.flush()
+    
+    def close(self):
+        """Shut down detection worker processes"""
+        with self._detector_lock:
+            if self._parallel_detector is not None:
+                self._parallel_detector.close()
+                self._parallel_detector = None
+    
+    def _acquire_scan_slot(self, progress=None):
+        """Wait for a free scan slot (see SAPIER_MAX_CONCURRENT_SCANS)"""
+        if self.scan_slots.acquire(blocking=False):
+            return
+        print("⏳ Waiting for another scan to finish...")
+        if progress:
+            progress(stage='waiting')
+        self.scan_slots.acquire()
+    
+    def matches_search_mode(self, image_path, search_mode):
+        """Cheap filename/folder pre-check for a search mode; faces are checked separately"""
+        if search_mode == "sara":
+            return self.is_sara_related(image_path, assume_faces=True)
+        if search_mode == "son":
+            return self.is_son_related(image_path, assume_faces=True)
+        return True
+    
+    def is_sara_related(self, image_path, assume_faces=False):
         """Check if image filename suggests it might be Sara (simple heuristic)"""
         filename = os.path.basename(image_path).lower()
         sara_keywords = ['sara', 'sarah', 'person', 'people', 'friend', 'photo']
@@ -93,9 +212,9 @@ class SimpleFaceFinder:
         has_sara_keyword = any(keyword in filename for keyword in sara_keywords[:2])  # Only sara/sarah
         has_general_keyword = any(keyword in filename for keyword in sara_keywords[2:])  # Other keywords
         
-        return has_sara_keyword or (has_general_keyword and self.has_faces(image_path))
+        return has_sara_keyword or (has_general_keyword and (assume_faces or self.has_faces(image_path)))
         
-    def is_son_related(self, image_path):
+    def is_son_related(self, image_path, assume_faces=False):
         """Check if image filename suggests it might be related to son (simple heuristic)"""
         filename = os.path.basename(image_path).lower()
         son_keywords = ['son', 'boy', 'kid', 'child', 'children', 'family']
@@ -109,78 +228,342 @@ class SimpleFaceFinder:
         son_folders = ['son', 'family', 'children', 'kids']
         in_son_folder = any(folder in folder_path for folder in son_folders)
         
-        return has_son_keyword or in_son_folder or (has_general_keyword and self.has_faces(image_path))
+        return has_son_keyword or in_son_folder or (has_general_keyword and (assume_faces or self.has_faces(image_path)))
     
-    def send_image_to_telegram(self, image_path, caption=""):
-        """Send image to Telegram"""
+    @staticmethod
+    def _sent_file_id(message, kind):
+        """file_id Telegram assigned to a sent photo (largest size) or document"""
+        if kind == 'document':
+            return (message.get('document') or {}).get('file_id')
+        photos = message.get('photo') or []
+        return photos[-1]['file_id'] if photos else None
+    
+    def _upload_source(self, image_path, kind):
+        """File to upload: the original for documents, a size-bounded rendition for photos"""
+        if kind == 'document':
+            return image_path
+        try:
+            return self.upload_preparer.prepare(image_path)
+        except Exception as e:
+            print(f"   ⚠️  Could not shrink {os.path.basename(image_path)}, sending original: {e}")
+            return image_path
+    
+    def send_image_to_telegram(self, image_path, caption="", as_document=None):
+        """
+        Send image to Telegram at the rate Telegram allows, reusing a cached file_id if possible.
+        Photos are uploaded as a shrunken rendition; as_document=True sends the original file.
+        """
+        try:
+            self._send_image(image_path, caption, as_document)
+            return True
+        except TelegramError as e:
+            print(f"   ❌ Telegram API error: {e}")
+            return False
+        except Exception as e:
+            print(f"   ❌ Error sending image: {e}")
+            return False
+    
+    def _send_image(self, image_path, caption="", as_document=None, chat_id=None):
+        """send_image_to_telegram that raises TelegramError/OSError instead of returning False"""
+        kind = 'document' if (self.send_originals if as_document is None else as_document) else 'photo'
+        method = 'sendDocument' if kind == 'document' else 'sendPhoto'
+        data = {
+            'chat_id': chat_id or self.chat_id,
+            'caption': caption
+        }
+        
+        file_id = self.file_cache.get(image_path, kind)
+        if file_id:
+            try:
+                self.telegram.call(method, {**data, kind: file_id})
+                return
+            except TelegramNetworkError:
+                raise
+            except TelegramError:
+                # Telegram no longer knows the file; fall back to uploading it
+                self.file_cache.forget(file_id)
+        
+        message = self.telegram.call(method, data, files={kind: self._upload_source(image_path, kind)}).result
+        file_id = self._sent_file_id(message, kind)
+        if file_id:
+            self.file_cache.put(image_path, file_id, kind)
+    
+    def send_images_to_telegram(self, image_paths, captions=None, as_document=None):
+        """Send up to 10 images as one album (sendMediaGroup), returning how many were sent"""
+        captions = captions or [""] * len(image_paths)
+        if len(image_paths) > MEDIA_GROUP_LIMIT:
+            raise ValueError(f"A media group holds at most {MEDIA_GROUP_LIMIT} photos")
+        
+        # Telegram albums need at least two items
+        if len(image_paths) < 2:
+            return sum(1 for path, caption in zip(image_paths, captions)
+                       if self.send_image_to_telegram(path, caption, as_document))
+        
+        kind = 'document' if (self.send_originals if as_document is None else as_document) else 'photo'
         try:
-            url = f"{self.api_base_url}/sendPhoto"
+            cached_ids = [self.file_cache.get(path, kind) for path in image_paths]
+            try:
+                messages = self._send_media_group(image_paths, captions, cached_ids, kind)
+            except TelegramNetworkError:
+                # Nothing says the file_ids are stale; keep them for the next attempt
+                raise
+            except TelegramError:
+                if not any(cached_ids):
+                    raise
+                # Telegram rejected one of the cached file_ids; upload everything once more
+                for file_id in filter(None, cached_ids):
+                    self.file_cache.forget(file_id)
+                cached_ids = [None] * len(image_paths)
+                messages = self._send_media_group(image_paths, captions, cached_ids, kind)
             
-            with open(image_path, 'rb') as photo:
-                files = {'photo': photo}
-                data = {
-                    'chat_id': self.chat_id,
-                    'caption': caption
-                }
-                
-                response = requests.post(url, files=files, data=data, timeout=30)
+            if not messages:
+                return 0
             
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('ok'):
-                    return True
-                else:
-                    print(f"   ❌ Telegram API error: {result}")
-                    return False
+            for image_path, cached_id, message in zip(image_paths, cached_ids, messages):
+                file_id = self._sent_file_id(message, kind)
+                if file_id and not cached_id:
+                    self.file_cache.put(image_path, file_id, kind)
+            return len(messages)
+            
+        except TelegramError as e:
+            print(f"   ❌ Telegram API error: {e}")
+            return 0
+        except Exception as e:
+            print(f"   ❌ Error sending album: {e}")
+            return 0
+    
+    def _send_media_group(self, image_paths, captions, file_ids, kind='photo'):
+        """Post one sendMediaGroup request, uploading only items without a file_id (raises TelegramError)"""
+        media = []
+        files = {}
+        for i, (image_path, caption, file_id) in enumerate(zip(image_paths, captions, file_ids)):
+            if file_id:
+                media.append({'type': kind, 'media': file_id, 'caption': caption})
             else:
-                print(f"   ❌ HTTP Error: {response.status_code}")
-                return False
+                files[f'{kind}{i}'] = self._upload_source(image_path, kind)
+                media.append({'type': kind, 'media': f'attach://{kind}{i}', 'caption': caption})
+        
+        data = {
+            'chat_id': self.chat_id,
+            'media': json.dumps(media)
+        }
+        return self.telegram.call('sendMediaGroup', data, files=files).result
+    
+    async def send_images_async(self, image_paths, captions=None, chat_ids=None, as_document=None, client=None):
+        """
+        Send photos to one or more chats concurrently, returning the number of successful sends.
+        Each photo is uploaded at most once; other chats get it by file_id. Pass an
+        AsyncTelegramClient as `client` to share it with other concurrent senders.
+        """
+        captions = captions or [""] * len(image_paths)
+        chat_ids = chat_ids or [self.chat_id]
+        kind = 'document' if (self.send_originals if as_document is None else as_document) else 'photo'
+        method = 'sendDocument' if kind == 'document' else 'sendPhoto'
+        
+        async def deliver(telegram, chat_id, image_path, caption, file_id):
+            data = {'chat_id': chat_id, 'caption': caption}
+            if file_id:
+                try:
+                    await telegram.call(method, {**data, kind: file_id})
+                    return file_id
+                except TelegramNetworkError:
+                    raise
+                except TelegramError:
+                    # Telegram no longer knows the file; fall back to uploading it
+                    self.file_cache.forget(file_id)
+            
+            source = await asyncio.to_thread(self._upload_source, image_path, kind)
+            message = (await telegram.call(method, data, files={kind: source})).result
+            new_id = self._sent_file_id(message, kind)
+            if new_id:
+                self.file_cache.put(image_path, new_id, kind)
+            return new_id
+        
+        async def send_one(telegram, image_path, caption):
+            sent = 0
+            try:
+                file_id = await deliver(telegram, chat_ids[0], image_path, caption, self.file_cache.get(image_path, kind))
+                sent += 1
+            except TelegramError as e:
+                print(f"   ❌ Failed to send {os.path.basename(image_path)}: {e}")
+                return 0
+            
+            results = await asyncio.gather(
+                *(deliver(telegram, chat_id, image_path, caption, file_id) for chat_id in chat_ids[1:]),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    print(f"   ❌ Failed to send {os.path.basename(image_path)}: {result}")
+                else:
+                    sent += 1
+            return sent
+        
+        async def send_all(telegram):
+            counts = await asyncio.gather(*(send_one(telegram, path, caption)
+                                            for path, caption in zip(image_paths, captions)))
+            return sum(counts)
+        
+        if client is not None:
+            return await send_all(client)
+        from telegram_async_client import AsyncTelegramClient  # Deferred: loads httpx/h2
+        async with AsyncTelegramClient(self.bot_token) as telegram:
+            return await send_all(telegram)
+    
+    def _send_batch(self, batch, stats, progress=None):
+        """Send a list of (number, image_path) as one album"""
+        names = ", ".join(os.path.basename(path) for _, path in batch)
+        print(f"📤 Sending album of {len(batch)}: {names}")
+        sent = self.send_images_to_telegram(
+            [path for _, path in batch],
+            [self._photo_caption(f"Photo {number}", path) for number, path in batch]
+        )
+        stats['sent'] += sent
+        if progress:
+            progress(sent=stats['sent'])
+        print(f"   {'✅' if sent == len(batch) else '❌'} Album sent: {sent}/{len(batch)} photos")
+    
+    def _photo_caption(self, label, image_path):
+        """Caption shown under a sent photo"""
+        return f"{label}\n📸 {os.path.basename(image_path)}\n🕐 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+    
+    def _upload_worker(self, upload_queue, stats, batch=False, progress=None):
+        """Uploader stage: send matched images as they arrive, until the end marker"""
+        pending = []
+        while True:
+            item = upload_queue.get()
+            if item is None:
+                break
+            
+            if batch:
+                # Albums go out once full; the remainder is flushed at the end
+                pending.append(item)
+                if len(pending) == MEDIA_GROUP_LIMIT:
+                    self._send_batch(pending, stats, progress)
+                    pending = []
+                continue
+            
+            number, image_path = item
+            try:
+                filename = os.path.basename(image_path)
+                print(f"📤 [{number}] Sending: {filename}")
                 
-        except Exception as e:
-            print(f"   ❌ Error sending image: {e}")
-            return False
+                # Send image
+                if self.send_image_to_telegram(image_path, self._photo_caption(f"Photo {number}", image_path)):
+                    stats['sent'] += 1
+                    if progress:
+                        progress(sent=stats['sent'])
+                    print(f"   ✅ Sent {filename}")
+                else:
+                    print(f"   ❌ Failed to send {filename}")
+                
+            except Exception as e:
+                print(f"   ❌ Error: {e}")
+        
+        if pending:
+            self._send_batch(pending, stats, progress)
     
-    def find_and_send_face_images(self, max_images=10, search_mode="faces"):
-        """Find images with faces and send them"""
+    def _deliver_queued_photo(self, item):
+        """Outbox handler for queued photos (raises so the outbox can tell permanent failures apart)"""
+        payload = item['payload']
+        print(f"📤 Sending: {os.path.basename(payload['path'])}")
+        self._send_image(payload['path'], payload['caption'], payload.get('as_document'), item['chat_id'])
+        return True
+    
+    def find_and_send_face_images(self, max_images=10, search_mode="faces", workers=None, upload_queue_size=4,
+                                  batch=False, durable=None, progress=None):
+        """
+        Find images with faces and send them, uploading matches while the scan continues.
+        With batch=True matches are sent as albums of up to 10 photos per request.
+        With durable=True (the default unless SAPIER_DURABLE_SENDS=0) matches go through the
+        outbox: failed sends are retried, and photos this chat already received are skipped.
+        progress, if given, is called with keyword updates (stage, checked, total, found, sent).
+        Returns the number of photos sent.
+        """
+        if durable is None:
+            durable = self.durable_sends
+        # Albums are sent directly; the outbox tracks single messages
+        durable = durable and not batch
+
         print("👤 Simple Face Detection System")
         print("=" * 50)
         
         # Find all images
-        all_images = self.find_all_images()
+        image_files = self.find_image_files()
         
-        if not all_images:
+        if not image_files:
             print("❌ No images found in gallery")
-            return
+            return 0
+        
+        # Sort by modification time (newest first), reusing the catalogued mtime
+        image_files.sort(key=attrgetter('mtime'), reverse=True)
         
-        # Sort by modification time (newest first)
-        all_images.sort(key=lambda x: os.path.getmtime(x), reverse=True)
+        # Filename/folder heuristics are cheap, so apply them before any detection
+        candidates = [image for image in image_files if self.matches_search_mode(image.path, search_mode)]
         
         print(f"\n🔍 Scanning images for {search_mode}...")
         print(f"⏳ This may take a few minutes...")
         print(f"🎯 Will send maximum {max_images} images")
+        print(f"⚙️  Detection workers: {workers or self.detect_workers}")
         print("-" * 50)
         
         found_images = []
         processed_count = 0
         
-        for i, image_path in enumerate(all_images):
-            try:
-                filename = os.path.basename(image_path)
-                print(f"📸 [{i+1}/{len(all_images)}] Checking: {filename}")
+        # Matches go to an uploader thread, so the first photo is on its way while
+        # detection keeps going: either the durable outbox or a bounded in-memory queue
+        upload_stats = {'sent': 0}
+        if durable:
+            outbox_ids = []
+            skipped_count = 0
+            
+            def deliver(item):
+                delivered = self._deliver_queued_photo(item)
+                if delivered:
+                    upload_stats['sent'] += 1
+                    if progress:
+                        progress(sent=upload_stats['sent'])
+                return delivered
+            
+            uploader = OutboxSender(self.outbox, {'photo': deliver})
+        else:
+            upload_queue = queue.Queue(maxsize=upload_queue_size)
+            uploader = threading.Thread(target=self._upload_worker,
+                                        args=(upload_queue, upload_stats, batch, progress), daemon=True)
+        uploader.start()
+        
+        self._acquire_scan_slot(progress)
+        results = self.iter_face_results(candidates, workers)
+        try:
+            if progress:
+                progress(stage='scanning', checked=0, total=len(candidates), found=0, sent=0)
+            for i, (image, boxes) in enumerate(results):
+                filename = os.path.basename(image.path)
+                print(f"📸 [{i+1}/{len(candidates)}] Checking: {filename}")
+                processed_count += 1
+                if progress:
+                    progress(checked=processed_count, found=len(found_images))
                 
-                # Check based on search mode
-                if search_mode == "faces":
-                    found = self.has_faces(image_path)
-                elif search_mode == "sara":
-                    found = self.is_sara_related(image_path) and self.has_faces(image_path)
-                elif search_mode == "son":
-                    found = self.is_son_related(image_path) and self.has_faces(image_path)
-                else:
-                    found = self.has_faces(image_path)
+                if isinstance(boxes, Exception):
+                    print(f"   ⚠️  Error processing {filename}: {boxes}")
+                    continue
                 
-                if found:
+                if boxes:
+                    if durable:
+                        key = file_dedupe_key('photo', image.path, image.size, image.mtime)
+                        caption = self._photo_caption(f"Photo {len(found_images) + 1}", image.path)
+                        item_id = self.outbox.enqueue('photo', self.chat_id, key,
+                                                      {'path': image.path, 'caption': caption})
+                        if item_id is None:
+                            print(f"   ⏭️  Match already sent, skipping")
+                            skipped_count += 1
+                            continue
+                        outbox_ids.append(item_id)
+                        uploader.wake()
+                    else:
+                        upload_queue.put((len(found_images) + 1, image.path))
                     print(f"   ✅ Match found!")
-                    found_images.append(image_path)
+                    found_images.append(image.path)
                     
                     # Stop if we've found enough images
                     if len(found_images) >= max_images:
@@ -188,83 +571,95 @@ class SimpleFaceFinder:
                         break
                 else:
                     print(f"   ❌ No match")
-                
-                processed_count += 1
-                
-                # Small delay to prevent overloading
-                time.sleep(0.1)
-                
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
-                continue
+        finally:
+            results.close()
+            self.scan_slots.release()
+            if not durable:
+                upload_queue.put(None)
+        
+        if found_images:
+            print(f"\n🎉 Found {len(found_images)} matching images, waiting for uploads to finish...")
+        if progress:
+            progress(stage='sending', checked=processed_count, found=len(found_images))
+        if durable:
+            if not uploader.drain(default_drain_timeout()):
+                print("⏳ Some photos are still queued; they will be retried on the next run")
+            uploader.stop()
+            if skipped_count:
+                print(f"⏭️  Skipped {skipped_count} matches already sent to this chat")
+        else:
+            uploader.join()
         
-        # Send found images to Telegram
         if not found_images:
             print(f"\n😔 No matching images found in {processed_count} images checked")
-            return
-        
-        print(f"\n🎉 Found {len(found_images)} matching images!")
-        print("📤 Sending to Telegram...")
-        print("-" * 50)
-        
-        sent_count = 0
-        for i, image_path in enumerate(found_images):
-            try:
-                filename = os.path.basename(image_path)
-                print(f"📤 [{i+1}/{len(found_images)}] Sending: {filename}")
-                
-                # Create caption
-                caption = f"Photo {i+1}/{len(found_images)}\n📸 {filename}\n🕐 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                
-                # Send image
-                if self.send_image_to_telegram(image_path, caption):
-                    sent_count += 1
-                    print(f"   ✅ Sent successfully")
-                    
-                    # Delay between sends to avoid rate limiting
-                    time.sleep(2)
-                else:
-                    print(f"   ❌ Failed to send")
-                
-            except Exception as e:
-                print(f"   ❌ Error: {e}")
-                continue
+            return 0
         
+        if durable:
+            sent_count = sum(1 for status in self.outbox.statuses(outbox_ids).values() if status == 'sent')
+        else:
+            sent_count = upload_stats['sent']
         print(f"\n🎉 Process Complete!")
         print(f"📊 Images scanned: {processed_count}")
         print(f"📸 Matching images found: {len(found_images)}")
         print(f"📤 Successfully sent: {sent_count}")
         print(f"📱 Check your Telegram for the photos!")
+        return sent_count
     
-    def send_recent_photos(self, max_images=10):
-        """Send recent photos regardless of content"""
+    def send_recent_photos(self, max_images=10, batch=False, as_document=None, progress=None):
+        """
+        Send recent photos regardless of content.
+        batch=True sends albums of up to 10; as_document=True sends the original files.
+        progress, if given, is called with keyword updates (stage, total, sent).
+        """
         print("📷 Recent Photos Sender")
         print("=" * 50)
         
-        all_images = self.find_all_images()
+        image_files = self.find_image_files()
         
-        if not all_images:
+        if not image_files:
             print("❌ No images found")
-            return
+            return 0
         
-        # Sort by modification time (newest first)
-        all_images.sort(key=lambda x: os.path.getmtime(x), reverse=True)
+        # Sort by modification time (newest first), reusing the catalogued mtime
+        image_files.sort(key=attrgetter('mtime'), reverse=True)
+        all_images = [image.path for image in image_files]
+        total = min(max_images, len(all_images))
         
-        print(f"📤 Sending {min(max_images, len(all_images))} most recent photos...")
+        print(f"📤 Sending {total} most recent photos...")
         print("-" * 50)
         
         sent_count = 0
+        if progress:
+            progress(stage='sending', total=total, sent=0)
+        if batch:
+            for start in range(0, total, MEDIA_GROUP_LIMIT):
+                chunk = all_images[start:min(start + MEDIA_GROUP_LIMIT, total)]
+                print(f"📤 [{start+1}-{start+len(chunk)}/{total}] Sending album...")
+                sent = self.send_images_to_telegram(
+                    chunk,
+                    [self._photo_caption(f"Recent photo {start+i+1}/{total}", path) for i, path in enumerate(chunk)],
+                    as_document
+                )
+                sent_count += sent
+                if progress:
+                    progress(sent=sent_count)
+                print(f"   {'✅' if sent == len(chunk) else '❌'} Album sent: {sent}/{len(chunk)} photos")
+            
+            print(f"\n🎉 Sent {sent_count} recent photos to Telegram!")
+            return sent_count
+        
         for i, image_path in enumerate(all_images[:max_images]):
             try:
                 filename = os.path.basename(image_path)
-                print(f"📤 [{i+1}/{min(max_images, len(all_images))}] Sending: {filename}")
+                print(f"📤 [{i+1}/{total}] Sending: {filename}")
                 
-                caption = f"Recent photo {i+1}/{min(max_images, len(all_images))}\n📸 {filename}\n🕐 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+                caption = self._photo_caption(f"Recent photo {i+1}/{total}", image_path)
                 
-                if self.send_image_to_telegram(image_path, caption):
+                if self.send_image_to_telegram(image_path, caption, as_document):
                     sent_count += 1
+                    if progress:
+                        progress(sent=sent_count)
                     print(f"   ✅ Sent successfully")
-                    time.sleep(2)
                 else:
                     print(f"   ❌ Failed to send")
                 
@@ -273,6 +668,7 @@ class SimpleFaceFinder:
                 continue
         
         print(f"\n🎉 Sent {sent_count} recent photos to Telegram!")
+        return sent_count
 
 def main():
     """Main function"""
@@ -285,10 +681,12 @@ def main():
     print("4. Send photos with faces (max 5)")
     print("5. Send recent photos (max 5)")
     print("6. Send Son-related photos (max 10)")
+    print("7. Send recent photos as one album (max 10)")
+    print("8. Send recent photos as original files (max 5)")
     print()
     
     try:
-        choice = input("Enter choice (1-6): ").strip()
+        choice = input("Enter choice (1-8): ").strip()
         
         if choice == "1":
             finder.find_and_send_face_images(max_images=10, search_mode="faces")
@@ -302,6 +700,10 @@ def main():
             finder.send_recent_photos(max_images=5)
         elif choice == "6":
             finder.find_and_send_face_images(max_images=10, search_mode="son")
+        elif choice == "7":
+            finder.send_recent_photos(max_images=10, batch=True)
+        elif choice == "8":
+            finder.send_recent_photos(max_images=5, as_document=True)
         else:
             print("❌ Invalid choice")
             
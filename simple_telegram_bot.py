@@ -7,57 +7,272 @@ This is a basic bot that responds to messages.
 import os
 import sys
 import time
-import requests
 import json
+import asyncio
+import secrets
+import threading
 from dotenv import load_dotenv
+from telegram_client import TelegramError, get_client
+from update_dispatcher import ChatDispatcher
+from telegram_webhook import WebhookServer
+from sapier_storage import atomic_write_json, data_path, read_json
+from job_manager import JobManager, JobQueueFull, QUEUED, DONE, FAILED
+from simple_face_finder import SimpleFaceFinder
+from auto_invoice_scanner import AutoInvoiceScanner
 
 # Load environment variables
 load_dotenv()
 
+# Scan commands: command -> (job kind, default image count, maximum image count)
+SCAN_COMMANDS = {
+    '/faces': ('faces', 5, 50),
+    '/recent': ('recent', 5, 50),
+    '/invoices': ('invoices', 10, 200),
+}
+
+
+class StatusMessage:
+    """
+    One bot message that is edited in place to show a job's progress.
+    
+    update() only records the latest text. A background thread makes the
+    editMessageText calls, at most one per min_interval (forced updates go out
+    as soon as possible), and skips intermediate texts. Scan threads reporting
+    progress therefore never wait on HTTP or on the chat's rate limit.
+    """
+    
+    def __init__(self, telegram, chat_id, message_id, min_interval=2.0):
+        self.telegram = telegram
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.min_interval = min_interval
+        self._changed = threading.Condition()
+        self._text = None
+        self._wanted = None
+        self._force = False
+        self._edited_at = 0.0
+        self._thread = None
+    
+    def update(self, text, force=False):
+        """Show text, at most one edit per min_interval unless force=True; never blocks"""
+        with self._changed:
+            self._wanted = text
+            self._force = self._force or force
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name='status-message')
+                self._thread.start()
+            else:
+                self._changed.notify_all()
+    
+    def flush(self, timeout=None):
+        """Wait until the latest text has been sent (False on timeout)"""
+        with self._changed:
+            return self._changed.wait_for(lambda: self._thread is None, timeout)
+    
+    def _run(self):
+        while True:
+            with self._changed:
+                while True:
+                    # Telegram rejects edits that don't change the text
+                    if self._wanted is None or self._wanted == self._text:
+                        self._wanted, self._force, self._thread = None, False, None
+                        self._changed.notify_all()
+                        return
+                    delay = 0 if self._force else self.min_interval - (time.monotonic() - self._edited_at)
+                    if delay <= 0:
+                        break
+                    self._changed.wait(delay)
+                text, self._wanted, self._force = self._wanted, None, False
+            
+            try:
+                self.telegram.edit_message_text(self.chat_id, self.message_id, text)
+                sent = True
+            except TelegramError as e:
+                print(f"⚠️  Failed to update status message: {e}")
+                sent = False
+            with self._changed:
+                if sent:
+                    self._text = text
+                self._edited_at = time.monotonic()
+
 class SimpleTelegramBot:
     def __init__(self):
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-        self.api_base_url = f"https://api.telegram.org/bot{self.bot_token}"
-        self.last_update_id = 0
+        self.last_error = None
         
         if not self.bot_token or self.bot_token == "YOUR_BOT_TOKEN_HERE":
             print("❌ Please set your TELEGRAM_BOT_TOKEN in the .env file")
             sys.exit(1)
+        
+        # The confirmed getUpdates offset survives restarts, so old updates are never reprocessed
+        bot_id = self.bot_token.split(':', 1)[0]
+        self.offset_path = data_path(f"bot_{bot_id}_offset.json")
+        self.last_update_id = (read_json(self.offset_path) or {}).get('last_update_id', 0)
+        
+        # Messages older than this many seconds when they arrive are dropped unanswered (0 = answer all)
+        self.skip_backlog_seconds = int(os.getenv('SAPIER_BOT_SKIP_BACKLOG_SECONDS', '0'))
+        
+        self.telegram = get_client(self.bot_token)
+        
+        # getUpdates is held open this long when idle, so new messages arrive immediately
+        self.poll_timeout = int(os.getenv('SAPIER_BOT_POLL_TIMEOUT', '50'))
+        self.allowed_updates = ['message']
+        
+        # Handlers run on a worker pool; each chat's messages are still handled in order
+        self.dispatcher = ChatDispatcher(self.handle_update)
+        
+        # Scan commands run as background jobs so the bot keeps answering meanwhile.
+        # Only the admin chat may start them (results are sent there).
+        self.admin_chat_id = os.getenv('TELEGRAM_ADMIN_USER_ID')
+        self.jobs = JobManager()
+        self._face_finder = None
+        self._invoice_scanner = None
+        self._engine_lock = threading.Lock()
+        # The face finder limits its own concurrent scans; the invoice scanner runs one at a time
+        self._invoice_scan_lock = threading.Lock()
     
     def send_message(self, chat_id, text):
-        """Send a message to a chat"""
-        url = f"{self.api_base_url}/sendMessage"
-        data = {
-            'chat_id': chat_id,
-            'text': text
-        }
-        
+        """Send a message to a chat, returning the sent message or None"""
         try:
-            response = requests.post(url, data=data, timeout=10)
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            return self.telegram.send_message(chat_id, text)
+        except TelegramError as e:
             print(f"Failed to send message: {e}")
             return None
     
+    async def broadcast_async(self, chat_ids, text, client=None):
+        """Send the same message to many chats concurrently, returning how many were delivered"""
+        async def send_all(telegram):
+            results = await asyncio.gather(*(telegram.send_message(chat_id, text) for chat_id in chat_ids),
+                                           return_exceptions=True)
+            for chat_id, result in zip(chat_ids, results):
+                if isinstance(result, Exception):
+                    print(f"Failed to send message to {chat_id}: {result}")
+            return sum(1 for result in results if not isinstance(result, Exception))
+        
+        if client is not None:
+            return await send_all(client)
+        from telegram_async_client import AsyncTelegramClient  # Deferred: loads httpx/h2
+        async with AsyncTelegramClient(self.bot_token) as telegram:
+            return await send_all(telegram)
+    
     def get_updates(self):
         """Get updates from Telegram"""
-        url = f"{self.api_base_url}/getUpdates"
-        params = {
-            'offset': self.last_update_id + 1,
-            'timeout': 10
-        }
-        
         try:
-            response = requests.get(url, params=params, timeout=15)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Failed to get updates: {response.status_code}")
-                return None
-        except requests.exceptions.RequestException as e:
+            return self.telegram.get_updates(offset=self.last_update_id + 1, timeout=self.poll_timeout,
+                                             allowed_updates=self.allowed_updates)
+        except TelegramError as e:
             print(f"Failed to get updates: {e}")
+            self.last_error = e
             return None
     
+    def save_offset(self):
+        """Persist the id of the last update received"""
+        try:
+            atomic_write_json(self.offset_path, {'last_update_id': self.last_update_id, 'saved_at': time.time()})
+        except OSError as e:
+            print(f"⚠️  Failed to save update offset: {e}")
+    
+    def is_stale(self, update):
+        """True if the update's message is older than the skip-backlog window"""
+        if not self.skip_backlog_seconds:
+            return False
+        sent_at = update.get('message', {}).get('date')
+        return sent_at is not None and time.time() - sent_at > self.skip_backlog_seconds
+    
+    def dispatch_update(self, update):
+        """Hand an update to the worker pool, ordered behind earlier updates from the same chat"""
+        if self.is_stale(update):
+            print(f"⏭️  Skipping stale update {update.get('update_id')}")
+            return
+        chat = update.get('message', {}).get('chat', {})
+        self.dispatcher.submit(chat.get('id'), update)
+    
+    def handle_update(self, update):
+        """Handle one update (runs on a dispatcher worker)"""
+        if 'message' in update:
+            self.handle_message(update['message'])
+    
+    def face_finder(self):
+        """Create the face finder on first use (loads OpenCV and the catalog)"""
+        with self._engine_lock:
+            if self._face_finder is None:
+                self._face_finder = SimpleFaceFinder()
+            return self._face_finder
+    
+    def invoice_scanner(self):
+        """Create the invoice scanner on first use"""
+        with self._engine_lock:
+            if self._invoice_scanner is None:
+                self._invoice_scanner = AutoInvoiceScanner()
+            return self._invoice_scanner
+    
+    def run_scan(self, kind, count, progress):
+        """Job body for a scan command, returning the number of items sent"""
+        if kind == 'invoices':
+            scanner = self.invoice_scanner()
+            with self._invoice_scan_lock:
+                return scanner.process_images(max_images=count, progress=progress)
+        
+        finder = self.face_finder()
+        if kind == 'recent':
+            return finder.send_recent_photos(max_images=count, progress=progress)
+        return finder.find_and_send_face_images(max_images=count, search_mode='faces', progress=progress)
+    
+    @staticmethod
+    def describe_job(job):
+        """Status message text for a scan job"""
+        progress = job.progress
+        title = {'faces': "👤 Face photo scan", 'recent': "📷 Recent photos",
+                 'invoices': "🧾 Invoice scan"}.get(job.kind, job.kind)
+        if job.status == DONE:
+            return f"{title}: ✅ done, sent {job.result or 0}"
+        if job.status == FAILED:
+            return f"{title}: ❌ failed: {job.error}"
+        if not progress:
+            return f"{title}: ⏳ waiting for a free worker..."
+        
+        parts = []
+        if 'checked' in progress:
+            parts.append(f"checked {progress['checked']}/{progress.get('total', '?')}")
+        if 'found' in progress:
+            parts.append(f"found {progress['found']}")
+        if 'sent' in progress:
+            parts.append(f"sent {progress['sent']}")
+        return f"{title}: 🔄 {progress.get('stage', 'running')} ({', '.join(parts)})"
+    
+    def start_scan_job(self, chat_id, command, argument):
+        """Handle a scan command: queue the job and return the initial reply (None if already answered)"""
+        if self.admin_chat_id is None or str(chat_id) != str(self.admin_chat_id):
+            return "⛔ Scans can only be started from the admin chat."
+        
+        kind, default_count, max_count = SCAN_COMMANDS[command]
+        try:
+            count = max(1, min(int(argument), max_count)) if argument else default_count
+        except ValueError:
+            return f"Usage: {command} [count] (1-{max_count})"
+        
+        status = self.send_message(chat_id, f"⏳ Starting {command} {count}...")
+        if status is None:
+            return None
+        status_message = StatusMessage(self.telegram, chat_id, status['message_id'])
+        
+        def on_change(job):
+            status_message.update(self.describe_job(job), force=not job.active)
+        
+        try:
+            job, created = self.jobs.submit(kind, lambda progress: self.run_scan(kind, count, progress),
+                                            params={'count': count}, dedupe_key=(kind, count), listener=on_change)
+        except JobQueueFull:
+            status_message.update("⛔ Too many scans are queued, try again later.", force=True)
+            return None
+        
+        if not created:
+            status_message.update(f"ℹ️ The same scan is already running (job {job.id}), following it here.",
+                                  force=True)
+        elif job.status == QUEUED:
+            on_change(job)
+        return None
+    
     def handle_message(self, message):
         """Handle incoming messages"""
         chat_id = message['chat']['id']
@@ -66,8 +281,15 @@ class SimpleTelegramBot:
         
         print(f"📩 Message from {user_name}: {text}")
         
+        command, _, argument = text.strip().partition(' ')
+        command = command.lower().split('@', 1)[0]
+        
         # Simple responses
-        if text.lower() in ['/start', '/hello']:
+        if command in SCAN_COMMANDS:
+            response = self.start_scan_job(chat_id, command, argument.strip())
+            if response is None:
+                return
+        elif text.lower() in ['/start', '/hello']:
             response = f"Hello {user_name}! 👋 I'm your bot. How can I help you?"
         elif text.lower() == '/help':
             response = """🤖 Available commands:
@@ -78,7 +300,10 @@ class SimpleTelegramBot:
 /ping - Test bot response
 /chatid - Get your chat ID
 /id - Get your chat ID (alias)
-/myid - Get your chat ID (alias)"""
+/myid - Get your chat ID (alias)
+/faces [n] - Find and send n photos with faces
+/recent [n] - Send the n most recent photos
+/invoices [n] - Scan n images for invoices"""
         elif text.lower() == '/time':
             response = f"🕐 Current time: {time.strftime('%Y-%m-%d %H:%M:%S')}"
         elif text.lower() == '/ping':
@@ -89,11 +314,10 @@ class SimpleTelegramBot:
             response = f"You said: {text}\n\nTry /help for available commands."
         
         # Send response
-        result = self.send_message(chat_id, response)
-        if result and result.get('ok'):
+        if self.send_message(chat_id, response) is not None:
             print(f"✅ Sent response to {user_name}")
         else:
-            print(f"❌ Failed to send response: {result}")
+            print(f"❌ Failed to send response to {user_name}")
     
     def run(self):
         """Main bot loop"""
@@ -101,28 +325,76 @@ class SimpleTelegramBot:
         print("Press Ctrl+C to stop")
         print("-" * 40)
         
+        error_delay = 1
         try:
             while True:
+                # getUpdates long-polls, so there is no need to sleep between successful calls
                 updates = self.get_updates()
                 
-                if updates and updates.get('ok'):
-                    for update in updates['result']:
+                if updates is not None:
+                    error_delay = 1
+                    for update in updates:
                         self.last_update_id = update['update_id']
-                        
-                        if 'message' in update:
-                            self.handle_message(update['message'])
-                
-                time.sleep(1)  # Small delay to avoid spam
+                        self.dispatch_update(update)
+                    if updates:
+                        self.save_offset()
+                else:
+                    # Back off only while Telegram is unreachable or refusing us
+                    time.sleep(getattr(self.last_error, 'retry_after', None) or error_delay)
+                    error_delay = min(error_delay * 2, 30)
                 
         except KeyboardInterrupt:
             print("\n🛑 Bot stopped by user")
         except Exception as e:
             print(f"❌ Bot error: {e}")
+        finally:
+            # Let replies to already-received messages go out before exiting
+            self.dispatcher.shutdown()
+            self.jobs.shutdown(wait=False)
+
+    def run_webhook(self, public_url, host='0.0.0.0', port=8443, path='/telegram-webhook', secret_token=None):
+        """
+        Receive updates through a webhook instead of polling.
+        public_url is the HTTPS address Telegram should POST to; it must reach this server
+        (usually through a reverse proxy). A random secret is used if none is given.
+        """
+        print("🤖 Starting Telegram Bot (webhook mode)...")
+        print("Press Ctrl+C to stop")
+        print("-" * 40)
+        
+        secret_token = secret_token or secrets.token_urlsafe(32)
+        server = WebhookServer(self.dispatch_update, secret_token=secret_token, host=host, port=port, path=path)
+        try:
+            self.telegram.set_webhook(public_url, secret_token=secret_token, allowed_updates=self.allowed_updates)
+            print(f"🌐 Webhook set to {public_url}, listening on {host}:{port}{path}")
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Bot stopped by user")
+        except TelegramError as e:
+            print(f"❌ Failed to set webhook: {e}")
+        finally:
+            server.stop()
+            self.dispatcher.shutdown()
+            self.jobs.shutdown(wait=False)
+            # Remove the webhook so polling mode works on the next start
+            try:
+                self.telegram.delete_webhook()
+            except TelegramError as e:
+                print(f"⚠️  Failed to remove webhook: {e}")
 
 def main():
     """Main function"""
     bot = SimpleTelegramBot()
-    bot.run()
+    
+    # Webhook mode when a public HTTPS URL is configured, long polling otherwise
+    webhook_url = os.getenv('SAPIER_WEBHOOK_URL')
+    if webhook_url:
+        bot.run_webhook(webhook_url,
+                        host=os.getenv('SAPIER_WEBHOOK_HOST', '0.0.0.0'),
+                        port=int(os.getenv('SAPIER_WEBHOOK_PORT', '8443')),
+                        secret_token=os.getenv('SAPIER_WEBHOOK_SECRET'))
+    else:
+        bot.run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Async Telegram Client
+asyncio counterpart of telegram_client.TelegramClient for sending many
+messages concurrently from one thread.
+
+Built on httpx.AsyncClient, with HTTP/2 when the h2 package is installed, so
+many requests share one connection. At most SAPIER_TG_MAX_CONCURRENCY
+requests are in flight at once. Sends wait on the same process-wide rate
+limiter as the synchronous client, so mixing the two never exceeds
+Telegram's limits. Results and errors use the same types as TelegramClient.
+
+transport is passed to httpx (e.g. an httpx.MockTransport in tests).
+
+Usage:
+    async with AsyncTelegramClient(bot_token) as client:
+        await asyncio.gather(*(client.send_message(chat, text) for chat in chats))
+"""
+
+import os
+import asyncio
+import time
+from telegram_client import API_ROOT, TelegramError, TelegramNetworkError, TelegramResult
+from telegram_rate_limiter import get_rate_limiter, retry_after_from
+
+try:
+    import httpx
+except ImportError:  # Optional: only needed for async sending
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def _read_file(path):
+    with open(path, 'rb') as f:
+        return os.path.basename(path), f.read()
+
+
+class AsyncTelegramClient:
+    def __init__(self, bot_token, rate_limiter=None, max_concurrency=None, connect_timeout=5, read_timeout=30,
+                 transport=None):
+        if httpx is None:
+            raise RuntimeError("Async sending needs httpx: pip install httpx (and h2 for HTTP/2)")
+
+        self.api_base_url = f"{API_ROOT}/bot{bot_token}"
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.max_concurrency = max_concurrency or int(os.getenv('SAPIER_TG_MAX_CONCURRENCY', '8'))
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=self.max_concurrency,
+                                max_keepalive_connections=self.max_concurrency),
+            transport=transport
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close pooled connections"""
+        await self._client.aclose()
+
+    async def call(self, method, data=None, files=None, read_timeout=None, max_attempts=3):
+        """
+        Call a Bot API method and return a TelegramResult.
+
+        files maps multipart field names to file paths; they are read off the event loop.
+        """
+        data = data or {}
+        chat_id = data.get('chat_id')
+        url = f"{self.api_base_url}/{method}"
+        payload = None
+
+        upload = {}
+        for name, path in (files or {}).items():
+            upload[name] = await asyncio.to_thread(_read_file, path)
+        timeout = httpx.Timeout((read_timeout or self.read_timeout) + 15 * len(upload), connect=self.connect_timeout)
+
+        for attempt in range(max_attempts):
+            if chat_id is not None:
+                delay = self.rate_limiter.reserve_chat(chat_id)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            try:
+                async with self._semaphore:
+                    # The global token is taken only once this request is about to go out
+                    if chat_id is not None:
+                        delay = self.rate_limiter.take_global()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    started = time.monotonic()
+                    response = await self._client.post(
+                        url, data={k: str(v) for k, v in data.items()}, files=upload or None, timeout=timeout
+                    )
+            except httpx.HTTPError as e:
+                raise TelegramNetworkError(method, str(e)) from e
+            elapsed = time.monotonic() - started
+
+            try:
+                payload = response.json()
+            except ValueError:
+                raise TelegramError(method, f"HTTP {response.status_code}: {response.text[:200]}",
+                                    response.status_code)
+
+            if payload.get('ok'):
+                return TelegramResult(method, payload.get('result'), elapsed)
+
+            retry_after = retry_after_from(payload)
+            if response.status_code == 429 and retry_after is not None and attempt + 1 < max_attempts:
+                print(f"⏳ Rate limited by Telegram on {method}, retrying in {retry_after:.0f}s")
+                self.rate_limiter.backoff(retry_after, chat_id)
+                continue
+            break
+
+        raise TelegramError(method, payload.get('description', 'Unknown error'),
+                            payload.get('error_code'), payload.get('parameters'))
+
+    async def send_message(self, chat_id, text, **options):
+        """Send a text message, returning the sent Message"""
+        return (await self.call('sendMessage', {'chat_id': chat_id, 'text': text, **options})).result
+
+    async def send_photo(self, chat_id, photo, caption="", upload=False):
+        """Send a photo by file_id/URL, or upload the file at `photo` when upload=True"""
+        data = {'chat_id': chat_id, 'caption': caption}
+        if upload:
+            return (await self.call('sendPhoto', data, files={'photo': photo})).result
+        return (await self.call('sendPhoto', {**data, 'photo': photo})).result
+
+    async def send_document(self, chat_id, document, caption="", upload=False):
+        """Send a document by file_id/URL, or upload the file at `document` when upload=True"""
+        data = {'chat_id': chat_id, 'caption': caption}
+        if upload:
+            return (await self.call('sendDocument', data, files={'document': document})).result
+        return (await self.call('sendDocument', {**data, 'document': document})).result
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Telegram Client
+Shared Telegram Bot API client used by every Sapier module.
+
+One requests.Session per bot token keeps TCP+TLS connections alive across
+calls, so each message after the first costs a single round trip. Calls that
+target a chat go through the shared rate limiter, and a 429 is retried after
+Telegram's retry_after. Successful calls return a TelegramResult. Failures
+raise TelegramError, or TelegramNetworkError when the request never got an
+answer.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import namedtuple
+from contextlib import ExitStack
+import requests
+from requests.adapters import HTTPAdapter
+from telegram_rate_limiter import get_rate_limiter, retry_after_from
+
+API_ROOT = "https://api.telegram.org"
+
+TelegramResult = namedtuple('TelegramResult', ['method', 'result', 'elapsed'])
+
+
+class TelegramError(Exception):
+    """The Bot API answered with an error (or not at all, see TelegramNetworkError)"""
+
+    def __init__(self, method, description, error_code=None, parameters=None):
+        super().__init__(f"{method}: {description}" + (f" (error {error_code})" if error_code else ""))
+        self.method = method
+        self.description = description
+        self.error_code = error_code
+        self.parameters = parameters or {}
+
+    @property
+    def retry_after(self):
+        return retry_after_from({'parameters': self.parameters})
+
+
+class TelegramNetworkError(TelegramError):
+    """The request failed before Telegram produced a response"""
+
+
+class TelegramClient:
+    def __init__(self, bot_token, rate_limiter=None, pool_size=None, connect_timeout=5, read_timeout=30):
+        self.bot_token = bot_token
+        self.api_base_url = f"{API_ROOT}/bot{bot_token}"
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+
+        pool_size = pool_size or int(os.getenv('SAPIER_TG_POOL_SIZE', '10'))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+
+    def _timeout(self, read_timeout=None, uploads=0):
+        # Uploads get extra read time per file
+        return (self.connect_timeout, (read_timeout or self.read_timeout) + 15 * uploads)
+
+    def call(self, method, data=None, files=None, read_timeout=None, max_attempts=3):
+        """
+        Call a Bot API method and return a TelegramResult.
+
+        files maps multipart field names to file paths (opened here) or file objects.
+        Calls with a chat_id in data are rate limited per chat.
+        """
+        data = data or {}
+        chat_id = data.get('chat_id')
+        url = f"{self.api_base_url}/{method}"
+        payload = None
+
+        for attempt in range(max_attempts):
+            if chat_id is not None:
+                self.rate_limiter.acquire(chat_id)
+
+            started = time.monotonic()
+            try:
+                with ExitStack() as stack:
+                    opened = {
+                        name: stack.enter_context(open(f, 'rb')) if isinstance(f, (str, os.PathLike)) else f
+                        for name, f in (files or {}).items()
+                    }
+                    if opened:
+                        response = self.session.post(url, data=data, files=opened,
+                                                     timeout=self._timeout(read_timeout, len(opened)))
+                    else:
+                        response = self.session.post(url, data=data, timeout=self._timeout(read_timeout))
+            except requests.exceptions.RequestException as e:
+                raise TelegramNetworkError(method, str(e)) from e
+            elapsed = time.monotonic() - started
+
+            try:
+                payload = response.json()
+            except ValueError:
+                raise TelegramError(method, f"HTTP {response.status_code}: {response.text[:200]}",
+                                    response.status_code)
+
+            if payload.get('ok'):
+                return TelegramResult(method, payload.get('result'), elapsed)
+
+            retry_after = retry_after_from(payload)
+            if response.status_code == 429 and retry_after is not None and attempt + 1 < max_attempts:
+                print(f"⏳ Rate limited by Telegram on {method}, retrying in {retry_after:.0f}s")
+                self.rate_limiter.backoff(retry_after, chat_id)
+                continue
+            break
+
+        raise TelegramError(method, payload.get('description', 'Unknown error'),
+                            payload.get('error_code'), payload.get('parameters'))
+
+    def get_me(self):
+        """Return the bot's own user object"""
+        return self.call('getMe').result
+
+    def get_webhook_info(self):
+        """Return the current webhook configuration"""
+        return self.call('getWebhookInfo').result
+
+    def get_updates(self, offset=None, timeout=0, allowed_updates=None):
+        """Fetch pending updates, long-polling for up to `timeout` seconds"""
+        data = {'timeout': timeout}
+        if offset is not None:
+            data['offset'] = offset
+        if allowed_updates is not None:
+            data['allowed_updates'] = json.dumps(list(allowed_updates))
+        return self.call('getUpdates', data, read_timeout=timeout + 10, max_attempts=1).result
+
+    def set_webhook(self, url, secret_token=None, allowed_updates=None, max_connections=None,
+                    drop_pending_updates=False):
+        """Have Telegram POST updates to url instead of serving them to getUpdates"""
+        data = {'url': url, 'drop_pending_updates': str(bool(drop_pending_updates)).lower()}
+        if secret_token is not None:
+            data['secret_token'] = secret_token
+        if allowed_updates is not None:
+            data['allowed_updates'] = json.dumps(list(allowed_updates))
+        if max_connections is not None:
+            data['max_connections'] = max_connections
+        return self.call('setWebhook', data).result
+
+    def delete_webhook(self, drop_pending_updates=False):
+        """Remove the webhook so getUpdates works again"""
+        return self.call('deleteWebhook', {'drop_pending_updates': str(bool(drop_pending_updates)).lower()}).result
+
+    def send_message(self, chat_id, text, **options):
+        """Send a text message, returning the sent Message"""
+        return self.call('sendMessage', {'chat_id': chat_id, 'text': text, **options}).result
+
+    def edit_message_text(self, chat_id, message_id, text, **options):
+        """Replace the text of a message the bot sent earlier"""
+        return self.call('editMessageText', {'chat_id': chat_id, 'message_id': message_id, 'text': text,
+                                             **options}).result
+
+    def check_connectivity(self):
+        """Raise TelegramNetworkError unless api.telegram.org is reachable"""
+        try:
+            self.session.get(API_ROOT, timeout=self._timeout(10))
+        except requests.exceptions.RequestException as e:
+            raise TelegramNetworkError('connect', str(e)) from e
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(bot_token):
+    """Return the process-wide client (and connection pool) for a bot token"""
+    with _clients_lock:
+        client = _clients.get(bot_token)
+        if client is None:
+            client = TelegramClient(bot_token)
+            _clients[bot_token] = client
+        return client
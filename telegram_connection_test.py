@@ -6,9 +6,9 @@ This script helps diagnose Telegram bot connection issues.
 
 import os
 import sys
-import requests
 import json
 from dotenv import load_dotenv
+from telegram_client import TelegramClient, TelegramError
 
 # Load environment variables
 load_dotenv()
@@ -16,7 +16,6 @@ load_dotenv()
 class TelegramConnectionTester:
     def __init__(self):
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
-        self.api_base_url = "https://api.telegram.org/bot"
         
     def test_connection(self):
         """Test all aspects of Telegram bot connection"""
@@ -36,74 +35,53 @@ class TelegramConnectionTester:
             
         print(f"✅ Bot token found: {self.bot_token[:10]}...")
         
+        client = TelegramClient(self.bot_token)
+        
         # Test 2: Check internet connectivity to Telegram
         try:
-            response = requests.get("https://api.telegram.org", timeout=10)
+            client.check_connectivity()
             print("✅ Internet connection to Telegram API: OK")
-        except requests.exceptions.RequestException as e:
+        except TelegramError as e:
             print(f"❌ Internet connection failed: {e}")
             print("💡 Solution: Check your internet connection or proxy settings")
             return False
             
         # Test 3: Test bot token validity
         try:
-            url = f"{self.api_base_url}{self.bot_token}/getMe"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                bot_info = response.json()
-                if bot_info.get('ok'):
-                    print(f"✅ Bot token is valid")
-                    print(f"   Bot name: {bot_info['result']['first_name']}")
-                    print(f"   Bot username: @{bot_info['result']['username']}")
-                else:
-                    print(f"❌ Bot token validation failed: {bot_info}")
-                    return False
-            elif response.status_code == 401:
+            bot_info = client.get_me()
+            print(f"✅ Bot token is valid")
+            print(f"   Bot name: {bot_info['first_name']}")
+            print(f"   Bot username: @{bot_info['username']}")
+                
+        except TelegramError as e:
+            if e.error_code == 401:
                 print("❌ Unauthorized: Bot token is invalid")
                 print("💡 Solution: Check your bot token from @BotFather")
-                return False
             else:
-                print(f"❌ HTTP Error {response.status_code}: {response.text}")
-                return False
-                
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Request failed: {e}")
+                print(f"❌ Bot token validation failed: {e}")
             return False
             
         # Test 4: Check webhook status (if applicable)
         try:
-            url = f"{self.api_base_url}{self.bot_token}/getWebhookInfo"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                webhook_info = response.json()
-                if webhook_info.get('ok'):
-                    webhook_url = webhook_info['result'].get('url', '')
-                    if webhook_url:
-                        print(f"ℹ️  Webhook URL: {webhook_url}")
-                        pending_updates = webhook_info['result'].get('pending_update_count', 0)
-                        if pending_updates > 0:
-                            print(f"⚠️  Pending updates: {pending_updates}")
-                    else:
-                        print("ℹ️  No webhook configured (using polling)")
+            webhook_info = client.get_webhook_info()
+            webhook_url = webhook_info.get('url', '')
+            if webhook_url:
+                print(f"ℹ️  Webhook URL: {webhook_url}")
+                pending_updates = webhook_info.get('pending_update_count', 0)
+                if pending_updates > 0:
+                    print(f"⚠️  Pending updates: {pending_updates}")
+            else:
+                print("ℹ️  No webhook configured (using polling)")
                         
-        except requests.exceptions.RequestException:
+        except TelegramError:
             print("⚠️  Could not check webhook status")
             
         # Test 5: Try to get updates
         try:
-            url = f"{self.api_base_url}{self.bot_token}/getUpdates"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                updates = response.json()
-                if updates.get('ok'):
-                    print(f"✅ Can retrieve updates: {len(updates['result'])} messages")
-                else:
-                    print(f"❌ Failed to get updates: {updates}")
+            updates = client.get_updates()
+            print(f"✅ Can retrieve updates: {len(updates)} messages")
                     
-        except requests.exceptions.RequestException as e:
+        except TelegramError as e:
             print(f"❌ Failed to get updates: {e}")
             
         print("\n🎉 Connection test completed!")
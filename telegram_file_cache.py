@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Telegram File ID Cache
+Remembers the file_id Telegram assigns to uploaded photos so re-sends reference
+the already-uploaded file instead of uploading the bytes again.
+
+Entries are scoped to the bot (file_ids are only valid for the bot that
+received them) and keyed by path + size + mtime. With
+SAPIER_FILE_ID_CACHE_HASH=1 the file's SHA-1 is stored too, so copies and
+renamed files are also recognised.
+"""
+
+import os
+import time
+import threading
+from sapier_storage import data_path, connect, file_sha1
+
+
+class TelegramFileCache:
+    def __init__(self, bot_token, db_path=None, use_content_hash=None):
+        # The numeric bot id is enough to scope file_ids; never store the token itself
+        self.bot_id = str(bot_token).split(':', 1)[0]
+        self.db_path = db_path or data_path('telegram_file_ids.db')
+        if use_content_hash is None:
+            use_content_hash = os.getenv('SAPIER_FILE_ID_CACHE_HASH', '0') == '1'
+        self.use_content_hash = use_content_hash
+
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS file_ids (
+                bot_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                content_hash TEXT,
+                file_id TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (bot_id, kind, path)
+            );
+            CREATE INDEX IF NOT EXISTS file_ids_hash ON file_ids(bot_id, kind, content_hash);
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def identity(path):
+        """Return the (size, mtime) identity of a file"""
+        st = os.stat(path)
+        return st.st_size, st.st_mtime
+
+    def get(self, path, kind='photo', size=None, mtime=None):
+        """Return the cached file_id for an unchanged file, or None"""
+        if size is None or mtime is None:
+            size, mtime = self.identity(path)
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, file_id FROM file_ids WHERE bot_id = ? AND kind = ? AND path = ?",
+                (self.bot_id, kind, path)
+            ).fetchone()
+        if row and row[0] == size and row[1] == mtime:
+            return row[2]
+
+        if not self.use_content_hash:
+            return None
+
+        content_hash = file_sha1(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_id FROM file_ids WHERE bot_id = ? AND kind = ? AND content_hash = ? LIMIT 1",
+                (self.bot_id, kind, content_hash)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, path, file_id, kind='photo', size=None, mtime=None):
+        """Record the file_id Telegram returned for a file"""
+        if size is None or mtime is None:
+            size, mtime = self.identity(path)
+        content_hash = file_sha1(path) if self.use_content_hash else None
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_ids VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.bot_id, kind, path, size, mtime, content_hash, file_id, time.time())
+            )
+            self._conn.commit()
+
+    def forget(self, file_id):
+        """Drop a file_id Telegram no longer accepts"""
+        with self._lock:
+            self._conn.execute("DELETE FROM file_ids WHERE bot_id = ? AND file_id = ?", (self.bot_id, file_id))
+            self._conn.commit()
+
+    def close(self):
+        """Close the underlying database"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Telegram Outbox
+Durable SQLite (WAL) queue of pending Telegram messages plus a sent-history index.
+
+Scanners enqueue photos and invoices instead of sending them inline, and an
+OutboxSender thread drains the queue. Failed sends are retried with
+exponential backoff; items that exhaust SAPIER_OUTBOX_MAX_ATTEMPTS, or whose
+send failed permanently (a 4xx from Telegram other than 429, or a source
+file that no longer exists), are parked as 'failed'. Every delivered
+(chat, dedupe key) pair is recorded, so rescans skip what a chat already has.
+Each bot has its own queue (outbox_bot_<bot id>.db, like the file_id cache's
+scoping): items are delivered, and recorded as delivered, to the chat they
+were queued for, by the bot that queued them.
+
+Several outboxes (threads, processes) can share the queue. Items are claimed
+in one immediate transaction and stamped with the claiming outbox and time.
+A claim is only taken over once it is older than SAPIER_OUTBOX_CLAIM_TIMEOUT
+seconds (default 300). That is how items of a process that died mid-send
+get picked up again. Delivered and parked rows are pruned after 30 days.
+"""
+
+import os
+import json
+import time
+import random
+import uuid
+import threading
+from sapier_storage import data_path, connect
+from telegram_client import TelegramError, TelegramNetworkError
+
+
+def default_drain_timeout():
+    """Seconds a scan waits for its queued sends before leaving them for the next run"""
+    return float(os.getenv('SAPIER_OUTBOX_DRAIN_TIMEOUT', '120'))
+
+
+def file_dedupe_key(kind, path, size, mtime):
+    """Dedupe key for a message derived from a source file's (catalogued) identity"""
+    return f"{kind}:{path}:{size}:{mtime}"
+
+
+def is_permanent_failure(error):
+    """True for send errors that retrying can't fix"""
+    if isinstance(error, FileNotFoundError):
+        return True
+    if isinstance(error, TelegramError) and not isinstance(error, TelegramNetworkError):
+        code = error.error_code or 0
+        return 400 <= code < 500 and code != 429
+    return False
+
+
+class TelegramOutbox:
+    def __init__(self, bot_token, db_path=None, max_attempts=None, base_delay=2.0, max_delay=600.0,
+                 claim_timeout=None):
+        # The numeric bot id is enough to scope the queue; never store the token itself
+        self.bot_id = str(bot_token).split(':', 1)[0]
+        self.db_path = db_path or data_path(f"outbox_bot_{self.bot_id}.db")
+        self.max_attempts = max_attempts or int(os.getenv('SAPIER_OUTBOX_MAX_ATTEMPTS', '8'))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        if claim_timeout is None:
+            claim_timeout = float(os.getenv('SAPIER_OUTBOX_CLAIM_TIMEOUT', '300'))
+        self.claim_timeout = claim_timeout
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                chat_id TEXT NOT NULL,
+                dedupe_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created REAL NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL,
+                UNIQUE (chat_id, dedupe_key)
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox(status, next_attempt_at);
+            CREATE TABLE IF NOT EXISTS sent_history (
+                chat_id TEXT NOT NULL,
+                dedupe_key TEXT NOT NULL,
+                sent_at REAL NOT NULL,
+                PRIMARY KEY (chat_id, dedupe_key)
+            );
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        for column, kind in (('claimed_by', 'TEXT'), ('claimed_at', 'REAL')):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+        self._conn.commit()
+
+    def was_sent(self, chat_id, dedupe_key):
+        """True if this item has already been delivered to the chat"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM sent_history WHERE chat_id = ? AND dedupe_key = ?",
+                (str(chat_id), dedupe_key)
+            ).fetchone() is not None
+
+    def enqueue(self, kind, chat_id, dedupe_key, payload):
+        """
+        Queue a message, returning its id.
+        Returns None if the chat already received it; an item already queued keeps its id.
+        """
+        chat_id = str(chat_id)
+        with self._lock:
+            if self._conn.execute(
+                "SELECT 1 FROM sent_history WHERE chat_id = ? AND dedupe_key = ?", (chat_id, dedupe_key)
+            ).fetchone():
+                return None
+
+            row = self._conn.execute(
+                "SELECT id, status FROM outbox WHERE chat_id = ? AND dedupe_key = ?", (chat_id, dedupe_key)
+            ).fetchone()
+            if row:
+                if row[1] == 'failed':
+                    # Explicitly re-requested: give it a fresh set of attempts
+                    self._conn.execute(
+                        "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = ?, payload = ? "
+                        "WHERE id = ?", (time.time(), json.dumps(payload), row[0])
+                    )
+                    self._conn.commit()
+                return row[0]
+
+            now = time.time()
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (kind, chat_id, dedupe_key, payload, next_attempt_at, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, chat_id, dedupe_key, json.dumps(payload), now, now)
+            )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def claim_due(self, kinds, limit=10):
+        """
+        Claim up to `limit` due items of the given kinds for this outbox and return them.
+        Due means pending and past its retry time, or claimed by someone whose claim timed out.
+        """
+        placeholders = ','.join('?' for _ in kinds)
+        with self._lock:
+            now = time.time()
+            # Select and claim in one write transaction so two senders never claim the same item
+            self._conn.commit()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    f"SELECT id, kind, chat_id, dedupe_key, payload, attempts FROM outbox "
+                    f"WHERE kind IN ({placeholders}) AND ((status = 'pending' AND next_attempt_at <= ?) "
+                    f"OR (status = 'sending' AND COALESCE(claimed_at, 0) <= ?)) "
+                    f"ORDER BY next_attempt_at, id LIMIT ?",
+                    (*kinds, now, now - self.claim_timeout, limit)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET status = 'sending', claimed_by = ?, claimed_at = ? WHERE id = ?",
+                    [(self.owner, now, r[0]) for r in rows]
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+        return [
+            {'id': r[0], 'kind': r[1], 'chat_id': r[2], 'dedupe_key': r[3], 'payload': json.loads(r[4]),
+             'attempts': r[5]}
+            for r in rows
+        ]
+
+    def next_due_in(self, kinds):
+        """Seconds until the next item of these kinds can be claimed (None if there is none)"""
+        placeholders = ','.join('?' for _ in kinds)
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT MIN(CASE status WHEN 'pending' THEN next_attempt_at ELSE COALESCE(claimed_at, 0) + ? END) "
+                f"FROM outbox WHERE kind IN ({placeholders}) "
+                f"AND (status = 'pending' OR (status = 'sending' AND COALESCE(claimed_by, '') != ?))",
+                (self.claim_timeout, *kinds, self.owner)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def outstanding(self, kinds):
+        """Number of queued or in-progress items of these kinds"""
+        placeholders = ','.join('?' for _ in kinds)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT COUNT(*) FROM outbox WHERE status IN ('pending', 'sending') AND kind IN ({placeholders})",
+                tuple(kinds)
+            ).fetchone()[0]
+
+    def mark_sent(self, item):
+        """Record a delivery and remember it in the sent history"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'sent', last_error = NULL, claimed_by = NULL WHERE id = ?", (item['id'],)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sent_history VALUES (?, ?, ?)", (item['chat_id'], item['dedupe_key'], now)
+            )
+            self._conn.commit()
+
+    def mark_failed(self, item, error, permanent=False):
+        """
+        Schedule a retry with exponential backoff, or park the item once attempts run out
+        (or straight away for a permanent failure). Returns the new status, or None if
+        another outbox has taken the item over meanwhile.
+        """
+        attempts = item['attempts'] + 1
+        if permanent or attempts >= self.max_attempts:
+            status, next_attempt_at = 'failed', time.time()
+        else:
+            delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+            status, next_attempt_at = 'pending', time.time() + delay * random.uniform(0.8, 1.2)
+
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, claimed_by = NULL "
+                "WHERE id = ? AND claimed_by = ?",
+                (status, attempts, next_attempt_at, str(error)[:500], item['id'], self.owner)
+            ).rowcount
+            self._conn.commit()
+        return status if updated else None
+
+    def statuses(self, ids):
+        """Return {id: status} for the given outbox ids"""
+        ids = list(ids)
+        if not ids:
+            return {}
+        placeholders = ','.join('?' for _ in ids)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT id, status FROM outbox WHERE id IN ({placeholders})", ids).fetchall()
+        return dict(rows)
+
+    def prune(self, older_than_days=30):
+        """Drop delivered and failed queue rows (the sent history is kept)"""
+        cutoff = time.time() - older_than_days * 86400
+        with self._lock:
+            self._conn.execute("DELETE FROM outbox WHERE status IN ('sent', 'failed') AND created < ?", (cutoff,))
+            self._conn.commit()
+
+
+class OutboxSender(threading.Thread):
+    """Background thread that drains outbox items of the kinds it has handlers for"""
+
+    def __init__(self, outbox, handlers, idle_wait=30.0):
+        super().__init__(daemon=True, name='outbox-sender')
+        self.outbox = outbox
+        # kind -> callable(item) returning True when delivered to item['chat_id']. Handlers may raise instead;
+        # permanent errors (see is_permanent_failure) park the item without retries
+        self.handlers = handlers
+        self.kinds = list(handlers)
+        self.idle_wait = idle_wait
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._idle = threading.Event()
+
+    def wake(self):
+        """Tell the sender new items were queued"""
+        self._idle.clear()
+        self._wake.set()
+
+    def stop(self):
+        """Stop after the current item"""
+        self._stop_event.set()
+        self._wake.set()
+
+    def drain(self, timeout=None):
+        """Wait until everything queued (including retries) is delivered or parked; False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.wake()
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._idle.wait(remaining):
+                return False
+            # The idle flag can be stale if items were queued meanwhile, so confirm against the queue
+            if self.outbox.outstanding(self.kinds) == 0:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+
+    def run(self):
+        self.outbox.prune()
+        while not self._stop_event.is_set():
+            items = self.outbox.claim_due(self.kinds)
+            if not items:
+                next_due = self.outbox.next_due_in(self.kinds)
+                if next_due is None:
+                    self._idle.set()
+                self._wake.wait(self.idle_wait if next_due is None else min(next_due, self.idle_wait))
+                self._wake.clear()
+                continue
+
+            for item in items:
+                try:
+                    delivered = self.handlers[item['kind']](item)
+                    error = None if delivered else "send failed"
+                except Exception as e:
+                    error = e
+
+                if error is None:
+                    self.outbox.mark_sent(item)
+                elif is_permanent_failure(error):
+                    self.outbox.mark_failed(item, error, permanent=True)
+                    print(f"   ❌ Not retrying queued {item['kind']}: {error}")
+                elif self.outbox.mark_failed(item, error) == 'failed':
+                    print(f"   ❌ Giving up on queued {item['kind']} after {self.outbox.max_attempts} attempts: {error}")
+                else:
+                    print(f"   ⚠️  Sending queued {item['kind']} failed, will retry: {error}")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Telegram Rate Limiter
+Shared token-bucket limiter for Telegram Bot API sends.
+
+Every send first books a slot in the bucket of its chat (about 1
+message/second for private chats, 20/minute for groups) and sleeps until
+then. Only when the send is about to go out does it take a token from the
+global bucket (about 30 messages/second per bot). A chat with a long backlog
+therefore books far-future slots in its own bucket only, and never delays
+sends to other chats. Callers sleep until their slot rather than a fixed
+guess. When Telegram still answers 429, the
+parameters.retry_after it returns blocks that chat (or all chats) until it
+expires.
+"""
+
+import os
+import time
+import threading
+
+DEFAULT_GLOBAL_RATE = 30.0
+DEFAULT_CHAT_RATE = 1.0
+DEFAULT_GROUP_RATE = 20 / 60.0
+
+
+class TokenBucket:
+    """Token bucket expressed as virtual scheduling: one token per 1/rate seconds, up to `burst` saved"""
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1.0 / rate
+        self.burst = max(1, burst)
+        self.next_free = 0.0  # theoretical arrival time of the next send
+
+    def earliest(self, now):
+        """Earliest time a token is available"""
+        return max(now, self.next_free - (self.burst - 1) * self.interval)
+
+    def consume(self, at):
+        """Take a token at time `at` (which must be >= earliest)"""
+        self.next_free = max(self.next_free, at) + self.interval
+
+
+def retry_after_from(payload):
+    """Extract parameters.retry_after (seconds) from a Telegram error payload"""
+    if not isinstance(payload, dict):
+        return None
+    retry_after = (payload.get('parameters') or {}).get('retry_after')
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TelegramRateLimiter:
+    def __init__(self, global_rate=None, chat_rate=None, group_rate=None, clock=time.monotonic, sleep=time.sleep):
+        self.global_rate = global_rate or float(os.getenv('SAPIER_TG_GLOBAL_RATE', DEFAULT_GLOBAL_RATE))
+        self.chat_rate = chat_rate or float(os.getenv('SAPIER_TG_CHAT_RATE', DEFAULT_CHAT_RATE))
+        self.group_rate = group_rate or float(os.getenv('SAPIER_TG_GROUP_RATE', DEFAULT_GROUP_RATE))
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._global = TokenBucket(self.global_rate, burst=int(self.global_rate))
+        self._chats = {}
+        self._blocked_until = {}  # chat_id (None = every chat) -> clock time
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Group and channel ids are negative
+            is_group = str(chat_id).startswith('-')
+            bucket = TokenBucket(self.group_rate if is_group else self.chat_rate, burst=1 if is_group else 3)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def reserve_chat(self, chat_id):
+        """Book the chat's next send slot, returning how many seconds to wait for it"""
+        chat_id = str(chat_id)
+        with self._lock:
+            now = self._clock()
+            chat_bucket = self._chat_bucket(chat_id)
+            at = max(chat_bucket.earliest(now), self._blocked_until.get(chat_id, 0.0))
+            chat_bucket.consume(at)
+            return at - now
+
+    def take_global(self):
+        """Take a global token for a send going out now, returning how many seconds to wait for it"""
+        with self._lock:
+            now = self._clock()
+            at = max(self._global.earliest(now), self._blocked_until.get(None, 0.0))
+            self._global.consume(at)
+            return at - now
+
+    def acquire(self, chat_id=None):
+        """Block until a send to chat_id is allowed"""
+        if chat_id is not None:
+            delay = self.reserve_chat(chat_id)
+            if delay > 0:
+                self._sleep(delay)
+        delay = self.take_global()
+        if delay > 0:
+            self._sleep(delay)
+
+    def backoff(self, retry_after, chat_id=None):
+        """Honor a 429 retry_after for one chat (or all chats when chat_id is None)"""
+        chat_id = str(chat_id) if chat_id is not None else None
+        with self._lock:
+            until = self._clock() + float(retry_after)
+            self._blocked_until[chat_id] = max(self._blocked_until.get(chat_id, 0.0), until)
+
+
+_shared_limiter = None
+_shared_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide limiter shared by every Telegram sender"""
+    global _shared_limiter
+    with _shared_lock:
+        if _shared_limiter is None:
+            _shared_limiter = TelegramRateLimiter()
+        return _shared_limiter
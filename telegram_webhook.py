@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Telegram Webhook Receiver
+Small embedded HTTP server that accepts Bot API webhook POSTs.
+
+Telegram puts the secret given to setWebhook in the
+X-Telegram-Bot-Api-Secret-Token header of every request, and requests
+without it are rejected. Valid updates are acknowledged straight away and
+handed to a callback, which should only queue the work (e.g.
+ChatDispatcher.submit), so Telegram never waits on a handler. While idle the server just sits on its
+socket: no outgoing requests at all.
+
+The server binds plain HTTP; put it behind a TLS-terminating reverse proxy
+(Telegram only delivers to HTTPS on ports 443, 80, 88 or 8443).
+
+Testing without Telegram (tests/test_telegram_webhook.py does this):
+    server = WebhookServer(handle_update, secret_token="s3cret", port=0)
+    server.start()
+    # POST JSON updates to server.url with the secret header
+    server.stop()
+"""
+
+import hmac
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# Updates are small; anything bigger is not from Telegram
+MAX_UPDATE_BYTES = 1024 * 1024
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    server_version = 'SapierWebhook/1.0'
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        webhook = self.server.webhook
+        if self.path != webhook.path:
+            return self._reply(404)
+
+        if webhook.secret_token is not None:
+            supplied = self.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(supplied.encode('utf-8'), webhook.secret_token.encode('utf-8')):
+                return self._reply(403)
+
+        try:
+            length = int(self.headers.get('Content-Length', '0'))
+        except ValueError:
+            return self._reply(400)
+        if length <= 0 or length > MAX_UPDATE_BYTES:
+            return self._reply(413 if length > MAX_UPDATE_BYTES else 400)
+
+        try:
+            update = json.loads(self.rfile.read(length))
+        except ValueError:
+            return self._reply(400)
+        if not isinstance(update, dict) or 'update_id' not in update:
+            return self._reply(400)
+
+        # Acknowledge before handling so Telegram can send the next update right away
+        self._reply(200)
+        webhook.deliver(update)
+
+    def do_GET(self):
+        self._reply(405)
+
+    def log_message(self, format, *args):
+        # Per-request access logs are noise for a bot; errors are still reported by deliver()
+        pass
+
+
+class WebhookServer:
+    def __init__(self, on_update, secret_token=None, host='127.0.0.1', port=8443, path='/telegram-webhook'):
+        self.on_update = on_update
+        self.secret_token = secret_token
+        self.path = path
+        self.received = 0
+        self._httpd = ThreadingHTTPServer((host, port), _WebhookHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.webhook = self
+        self._thread = None
+        self._serving = False
+
+    @property
+    def server_address(self):
+        return self._httpd.server_address
+
+    @property
+    def url(self):
+        """Local URL the server answers on (useful with port=0 in tests)"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{self.path}"
+
+    def deliver(self, update):
+        self.received += 1
+        try:
+            self.on_update(update)
+        except Exception as e:
+            print(f"❌ Error queuing webhook update {update.get('update_id')}: {e}")
+
+    def serve_forever(self):
+        """Serve in the current thread until stop() is called"""
+        self._serving = True
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._serving = False
+
+    def start(self):
+        """Serve from a background thread"""
+        self._serving = True
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True, name='telegram-webhook')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and release the socket"""
+        # shutdown() blocks until serve_forever returns, so only call it while serving
+        if self._serving:
+            self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
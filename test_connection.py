@@ -5,8 +5,8 @@ Quick test to verify Telegram bot is working in Sapier directory.
 """
 
 import os
-import requests
 from dotenv import load_dotenv
+from telegram_client import TelegramClient, TelegramError
 
 def test_telegram_connection():
     """Test Telegram bot connection"""
@@ -30,51 +30,27 @@ def test_telegram_connection():
     print(f"✅ Bot Token: {bot_token[:10]}...{bot_token[-10:]}")
     print(f"✅ Chat ID: {chat_id}")
     
+    client = TelegramClient(bot_token)
+    
     # Test bot info
     try:
-        url = f"https://api.telegram.org/bot{bot_token}/getMe"
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code == 200:
-            bot_info = response.json()
-            if bot_info.get('ok'):
-                bot_name = bot_info['result']['username']
-                print(f"✅ Bot connected: @{bot_name}")
-            else:
-                print(f"❌ Bot API error: {bot_info}")
-                return False
-        else:
-            print(f"❌ HTTP Error: {response.status_code}")
-            return False
+        bot_info = client.get_me()
+        print(f"✅ Bot connected: @{bot_info['username']}")
     
-    except Exception as e:
-        print(f"❌ Connection error: {e}")
+    except TelegramError as e:
+        print(f"❌ Bot API error: {e}")
         return False
     
     # Test sending a message
     try:
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        data = {
-            'chat_id': chat_id,
-            'text': f'🎉 Sapier Photo Sender is ready!\n📸 Connected from: {os.getcwd()}\n🕐 Test time: {os.popen("date /t & time /t").read().strip()}'
-        }
-        
-        response = requests.post(url, data=data, timeout=10)
+        text = f'🎉 Sapier Photo Sender is ready!\n📸 Connected from: {os.getcwd()}\n🕐 Test time: {os.popen("date /t & time /t").read().strip()}'
+        client.send_message(chat_id, text)
         
-        if response.status_code == 200:
-            result = response.json()
-            if result.get('ok'):
-                print("✅ Test message sent successfully!")
-                print("📱 Check your Telegram for the test message")
-                return True
-            else:
-                print(f"❌ Message send error: {result}")
-                return False
-        else:
-            print(f"❌ HTTP Error: {response.status_code}")
-            return False
+        print("✅ Test message sent successfully!")
+        print("📱 Check your Telegram for the test message")
+        return True
             
-    except Exception as e:
+    except TelegramError as e:
         print(f"❌ Message send error: {e}")
         return False
 
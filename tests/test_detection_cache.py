@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import detection_cache
+from detection_cache import DetectionCache
+
+
+class DetectionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.params = DetectionCache.params_key({'minSize': [30, 30]})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def cache(self, **kwargs):
+        cache = DetectionCache(os.path.join(self.tmp, 'detections.db'), **kwargs)
+        self.addCleanup(cache.close)
+        return cache
+
+    def image(self, name, data=b'image'):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_hit_only_for_unchanged_file_and_same_params(self):
+        cache = self.cache(use_content_hash=False)
+        cache.put('a.jpg', 100, 1.0, self.params, [(1, 2, 3, 4)])
+
+        self.assertEqual(cache.get('a.jpg', 100, 1.0, self.params), [[1, 2, 3, 4]])
+        self.assertIsNone(cache.get('a.jpg', 100, 2.0, self.params))
+        self.assertIsNone(cache.get('a.jpg', 101, 1.0, self.params))
+        self.assertIsNone(cache.get('a.jpg', 100, 1.0, DetectionCache.params_key({'minSize': [40, 40]})))
+
+    def test_results_survive_reopening(self):
+        self.cache(use_content_hash=False).put('a.jpg', 100, 1.0, self.params, [])
+        self.assertEqual(self.cache(use_content_hash=False).get('a.jpg', 100, 1.0, self.params), [])
+
+    def test_renamed_file_is_recognised_by_content(self):
+        cache = self.cache(use_content_hash=True)
+        original = self.image('original.jpg')
+        cache.put(original, 5, 1.0, self.params, [(1, 1, 9, 9)])
+
+        renamed = self.image('renamed.jpg')
+        self.assertEqual(cache.get(renamed, 5, 2.0, self.params), [[1, 1, 9, 9]])
+        self.assertIsNone(cache.get(self.image('other.jpg', b'different'), 9, 1.0, self.params))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = self.cache(max_entries=10, use_content_hash=False)
+        for i in range(10):
+            cache.put(f'{i}.jpg', 1, 1.0, self.params, [])
+        # An old hit refreshes last_used, so it outlives younger entries
+        cache._conn.execute("UPDATE detections SET last_used = last_used - ?", (2 * detection_cache.TOUCH_INTERVAL,))
+        cache._conn.execute("UPDATE detections SET last_used = 0 WHERE path = '0.jpg'")
+        cache._conn.commit()
+        self.assertEqual(cache.get('0.jpg', 1, 1.0, self.params), [])
+
+        cache.put('new.jpg', 1, 1.0, self.params, [])
+        cache.trim()
+
+        self.assertIsNotNone(cache.get('0.jpg', 1, 1.0, self.params))
+        self.assertIsNotNone(cache.get('new.jpg', 1, 1.0, self.params))
+        self.assertIsNone(cache.get('1.jpg', 1, 1.0, self.params))
+
+    def test_hits_do_not_write_until_stale(self):
+        cache = self.cache(use_content_hash=False)
+        cache.put('a.jpg', 1, 1.0, self.params, [])
+        before = cache._conn.total_changes
+
+        for _ in range(50):
+            cache.get('a.jpg', 1, 1.0, self.params)
+        cache.flush()
+
+        self.assertEqual(cache._conn.total_changes, before)
+
+
+if __name__ == '__main__':
+    unittest.main()
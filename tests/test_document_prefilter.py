@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from document_prefilter import document_aspect, looks_like_document, prefilter_enabled
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # Scoring images needs OpenCV; the pure helpers don't
+    cv2 = None
+
+
+class DocumentAspectTest(unittest.TestCase):
+    def test_pages_and_receipts_score(self):
+        self.assertEqual(document_aspect(2970, 2100), 1.0)   # A4 portrait
+        self.assertEqual(document_aspect(1100, 850), 1.0)    # US Letter portrait
+        self.assertEqual(document_aspect(3000, 800), 1.0)    # receipt strip
+
+    def test_camera_frames_do_not_score(self):
+        for height, width in ((3000, 4000), (4000, 3000), (2000, 3000), (3000, 2000), (1080, 1920), (1920, 1080)):
+            self.assertEqual(document_aspect(height, width), 0.0, (height, width))
+
+    def test_prefilter_is_opt_in(self):
+        with mock.patch.dict(os.environ, {}, clear=True):
+            self.assertFalse(prefilter_enabled())
+
+
+@unittest.skipIf(cv2 is None, "needs OpenCV")
+class LooksLikeDocumentTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, name, image):
+        path = os.path.join(self.tmp, name)
+        cv2.imwrite(path, image)
+        return path
+
+    def test_images_without_text_are_rejected(self):
+        wall = np.full((1500, 2000, 3), 235, np.uint8)
+        snow = cv2.cvtColor(np.clip(np.random.normal(240, 6, (1500, 2000)), 0, 255).astype(np.uint8),
+                            cv2.COLOR_GRAY2BGR)
+        noise = (np.random.rand(1500, 2000, 3) * 255).astype(np.uint8)
+        for name, image in (('wall.jpg', wall), ('snow.jpg', snow), ('noise.jpg', noise)):
+            self.assertFalse(looks_like_document(self.write(name, image)), name)
+
+    def test_text_page_passes(self):
+        page = np.full((2828, 2000, 3), 245, np.uint8)
+        for row in range(20):
+            cv2.putText(page, "Item %02d   Quantity 1   Price 12.50" % row, (150, 250 + row * 110),
+                        cv2.FONT_HERSHEY_SIMPLEX, 2.2, (20, 20, 20), 5)
+        self.assertTrue(looks_like_document(self.write('page.jpg', page)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from image_catalog import ImageCatalog
+
+EXTENSIONS = {'.jpg', '.png'}
+
+
+class ImageCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.root = os.path.join(self.tmp, 'Pictures')
+        os.makedirs(os.path.join(self.root, 'trip'))
+        self.catalog = ImageCatalog(os.path.join(self.tmp, 'catalog.db'), max_workers=2)
+
+    def tearDown(self):
+        self.catalog.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, *parts):
+        path = os.path.join(self.root, *parts)
+        with open(path, 'wb') as f:
+            f.write(b'image')
+        return path
+
+    def bump(self, *parts):
+        # Some filesystems have coarse directory mtimes; make every change visible
+        path = os.path.join(self.root, *parts)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    def refresh(self):
+        stats = self.catalog.refresh([self.root], EXTENSIONS)
+        return stats, sorted(os.path.relpath(image.path, self.root) for image in self.catalog.images([self.root]))
+
+    def test_added_files_are_catalogued_with_identity(self):
+        path = self.write('trip', 'beach.jpg')
+        self.write('notes.txt')
+
+        stats, images = self.refresh()
+
+        self.assertEqual(images, [os.path.join('trip', 'beach.jpg')])
+        [image] = self.catalog.images([self.root])
+        self.assertEqual((image.size, image.mtime), (5, os.stat(path).st_mtime))
+        self.assertEqual(stats['rescanned'], 2)
+
+    def test_unchanged_folders_are_not_listed_again(self):
+        self.write('trip', 'beach.jpg')
+        self.refresh()
+
+        stats, images = self.refresh()
+
+        self.assertEqual(stats, {'rescanned': 0, 'unchanged': 2})
+        self.assertEqual(images, [os.path.join('trip', 'beach.jpg')])
+
+    def test_deleted_file_and_folder_are_dropped(self):
+        self.write('top.png')
+        self.write('trip', 'beach.jpg')
+        self.refresh()
+
+        os.remove(os.path.join(self.root, 'top.png'))
+        shutil.rmtree(os.path.join(self.root, 'trip'))
+        self.bump()
+
+        _, images = self.refresh()
+        self.assertEqual(images, [])
+
+    def test_renamed_file_and_folder_are_followed(self):
+        self.write('top.png')
+        self.write('trip', 'beach.jpg')
+        self.refresh()
+
+        os.rename(os.path.join(self.root, 'top.png'), os.path.join(self.root, 'renamed.png'))
+        os.rename(os.path.join(self.root, 'trip'), os.path.join(self.root, 'holiday'))
+        self.bump()
+
+        _, images = self.refresh()
+        self.assertEqual(images, [os.path.join('holiday', 'beach.jpg'), 'renamed.png'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import os
+import unittest
+from unittest import mock
+
+import invoice_ocr
+
+
+class ExtractTextDefaultsTest(unittest.TestCase):
+    def test_full_page_ocr_by_default(self):
+        backend = mock.Mock()
+        backend.image_to_string.return_value = " INVOICE Total due "
+        with mock.patch.dict(os.environ, {}, clear=True), \
+                mock.patch.object(invoice_ocr, 'is_invoice_candidate') as quick_pass, \
+                mock.patch.object(invoice_ocr, 'looks_like_document') as prefilter, \
+                mock.patch.object(invoice_ocr, 'load_for_ocr', return_value=('image', {})), \
+                mock.patch.object(invoice_ocr, 'get_ocr_backend', return_value=backend):
+            self.assertEqual(invoice_ocr.extract_text('receipt.jpg'), "INVOICE Total due")
+        quick_pass.assert_not_called()
+        prefilter.assert_not_called()
+
+    def test_is_invoice_text_needs_several_keywords(self):
+        self.assertTrue(invoice_ocr.is_invoice_text("INVOICE #12\nSubtotal 10.00\nTotal due 12.00"))
+        self.assertFalse(invoice_ocr.is_invoice_text("Happy birthday, see you at the party"))
+        self.assertFalse(invoice_ocr.is_invoice_text(""))
+
+
+if __name__ == '__main__':
+    unittest.main()
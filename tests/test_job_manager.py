@@ -0,0 +1,76 @@
+import threading
+import unittest
+
+from job_manager import DONE, FAILED, JobManager, JobQueueFull
+
+
+class JobManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.manager = JobManager(max_workers=1, max_queued=1)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.manager.shutdown()
+
+    def blocking(self, progress):
+        self.release.wait(5)
+        return 'blocked'
+
+    def test_result_and_progress(self):
+        def work(progress):
+            progress(checked=1)
+            progress(checked=2, found=1)
+            return 42
+
+        job, created = self.manager.submit('scan', work)
+        snapshot = self.manager.wait(job.id, timeout=5)
+
+        self.assertTrue(created)
+        self.assertEqual(snapshot['status'], DONE)
+        self.assertEqual(snapshot['result'], 42)
+        self.assertEqual(snapshot['progress'], {'checked': 2, 'found': 1})
+
+    def test_failure_is_recorded(self):
+        def work(progress):
+            raise ValueError('no photos')
+
+        job, _ = self.manager.submit('scan', work)
+        snapshot = self.manager.wait(job.id, timeout=5)
+
+        self.assertEqual((snapshot['status'], snapshot['error']), (FAILED, 'no photos'))
+
+    def test_duplicate_active_job_is_reused(self):
+        first, _ = self.manager.submit('faces', self.blocking, dedupe_key='faces:10')
+        second, created = self.manager.submit('faces', self.blocking, dedupe_key='faces:10')
+
+        self.assertIs(second, first)
+        self.assertFalse(created)
+
+    def test_full_queue_refuses_new_jobs(self):
+        job, _ = self.manager.submit('scan', self.blocking)      # running
+        running = self.manager.wait_for_change(job.id, 0, timeout=5)
+        self.assertEqual(running['status'], 'running')
+        self.manager.submit('scan', self.blocking)               # queued
+
+        with self.assertRaises(JobQueueFull):
+            self.manager.submit('scan', self.blocking)
+
+    def test_wait_for_change_returns_on_progress(self):
+        step = threading.Event()
+
+        def work(progress):
+            step.wait(5)
+            progress(checked=1)
+            self.release.wait(5)
+
+        job, _ = self.manager.submit('scan', work)
+        version = self.manager.wait_for_change(job.id, 0, timeout=5)['version']
+        step.set()
+
+        snapshot = self.manager.wait_for_change(job.id, version, timeout=5)
+        self.assertEqual(snapshot['progress'], {'checked': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
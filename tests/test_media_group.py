@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from simple_face_finder import SimpleFaceFinder
+from telegram_client import TelegramError, TelegramNetworkError, TelegramResult
+from telegram_file_cache import TelegramFileCache
+
+
+class ScriptedTelegram:
+    """Fails sendMediaGroup with the given errors in turn, then succeeds"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def call(self, method, data=None, files=None, **kwargs):
+        self.calls.append((method, sorted(files or {})))
+        if self.errors:
+            raise self.errors.pop(0)
+        return TelegramResult(method, [{'document': {'file_id': f'new-{i}'}} for i in range(2)], 0.0)
+
+
+class MediaGroupFileIdTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.paths = []
+        for name in ('a.jpg', 'b.jpg'):
+            path = os.path.join(self.tmp, name)
+            with open(path, 'wb') as f:
+                f.write(b'jpeg')
+            self.paths.append(path)
+
+        self.finder = SimpleFaceFinder.__new__(SimpleFaceFinder)
+        self.finder.chat_id = 'chat'
+        self.finder.send_originals = True
+        self.finder.file_cache = TelegramFileCache('123:token', os.path.join(self.tmp, 'file_ids.db'))
+        for i, path in enumerate(self.paths):
+            self.finder.file_cache.put(path, f'cached-{i}', 'document')
+
+    def tearDown(self):
+        self.finder.file_cache.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def cached(self):
+        return [self.finder.file_cache.get(path, 'document') for path in self.paths]
+
+    def test_network_error_keeps_cached_file_ids(self):
+        self.finder.telegram = ScriptedTelegram(TelegramNetworkError('sendMediaGroup', 'timed out'))
+
+        self.assertEqual(self.finder.send_images_to_telegram(self.paths), 0)
+
+        # No re-upload, and the next attempt can still send by file_id
+        self.assertEqual(self.finder.telegram.calls, [('sendMediaGroup', [])])
+        self.assertEqual(self.cached(), ['cached-0', 'cached-1'])
+
+    def test_rejected_file_id_falls_back_to_upload(self):
+        self.finder.telegram = ScriptedTelegram(
+            TelegramError('sendMediaGroup', 'Bad Request: wrong file identifier', 400))
+
+        self.assertEqual(self.finder.send_images_to_telegram(self.paths), 2)
+
+        self.assertEqual(self.finder.telegram.calls,
+                         [('sendMediaGroup', []), ('sendMediaGroup', ['document0', 'document1'])])
+        self.assertEqual(self.cached(), ['new-0', 'new-1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import math
+import unittest
+from unittest import mock
+
+from process_pool import OrderedProcessPool, default_workers
+
+
+class OrderedProcessPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = OrderedProcessPool(2, window_per_worker=1)
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_results_in_input_order_with_lookups_and_errors(self):
+        items = [('a', 16.0), ('cached', 0.0), ('bad', -1.0), ('b', 9.0)]
+        lookup = lambda key, value: 'hit' if key == 'cached' else None
+
+        results = list(self.pool.stream(math.sqrt, items, lookup=lookup))
+
+        self.assertEqual([(key, computed) for key, _, computed in results],
+                         [('a', True), ('cached', False), ('bad', True), ('b', True)])
+        self.assertEqual(results[0][1], 4.0)
+        self.assertEqual(results[1][1], 'hit')
+        self.assertIsInstance(results[2][1], ValueError)
+        self.assertEqual(results[3][1], 3.0)
+
+    def test_window_bounds_submissions(self):
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield i, float(i)
+
+        stream = self.pool.stream(math.sqrt, items())
+        next(stream)
+        stream.close()
+        # Only the window (2 workers x 1) was ever pulled from the input
+        self.assertLessEqual(len(consumed), 3)
+
+    def test_default_workers(self):
+        with mock.patch.dict('os.environ', {'SAPIER_TEST_WORKERS': '0'}):
+            self.assertEqual(default_workers('SAPIER_TEST_WORKERS'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
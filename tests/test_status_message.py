@@ -0,0 +1,49 @@
+import threading
+import time
+import unittest
+
+from simple_telegram_bot import StatusMessage
+
+
+class SlowTelegram:
+    """Fake client whose edits take a while, like a rate-limited editMessageText"""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.edits = []
+        self.lock = threading.Lock()
+
+    def edit_message_text(self, chat_id, message_id, text):
+        time.sleep(self.delay)
+        with self.lock:
+            self.edits.append(text)
+
+
+class StatusMessageTest(unittest.TestCase):
+    def test_update_never_blocks_and_coalesces(self):
+        telegram = SlowTelegram()
+        status = StatusMessage(telegram, 1, 2, min_interval=0.1)
+
+        started = time.monotonic()
+        for i in range(100):
+            status.update(f"checked {i}")
+        status.update("done", force=True)
+        self.assertLess(time.monotonic() - started, 0.1)
+
+        self.assertTrue(status.flush(timeout=5))
+        self.assertEqual(telegram.edits[-1], "done")
+        self.assertLess(len(telegram.edits), 5)
+
+    def test_unchanged_text_is_not_sent_again(self):
+        telegram = SlowTelegram(delay=0)
+        status = StatusMessage(telegram, 1, 2, min_interval=0)
+
+        status.update("same", force=True)
+        self.assertTrue(status.flush(timeout=5))
+        status.update("same", force=True)
+        self.assertTrue(status.flush(timeout=5))
+        self.assertEqual(telegram.edits, ["same"])
+
+
+if __name__ == '__main__':
+    unittest.main()
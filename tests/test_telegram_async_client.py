@@ -0,0 +1,92 @@
+import asyncio
+import json
+import os
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs
+
+from telegram_client import TelegramError
+from telegram_rate_limiter import TelegramRateLimiter
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@unittest.skipIf(httpx is None, "httpx is not installed")
+class AsyncTelegramClientTest(unittest.TestCase):
+    def setUp(self):
+        self.requests = []
+        self.responses = []
+        clock = FakeClock()
+        self.limiter = TelegramRateLimiter(global_rate=1000, chat_rate=1000, group_rate=1000,
+                                           clock=clock, sleep=clock.sleep)
+
+    def handler(self, request):
+        self.requests.append((request.url.path, parse_qs(request.content.decode())))
+        status, payload = self.responses.pop(0) if self.responses else (200, {'ok': True, 'result': {}})
+        return httpx.Response(status, json=payload)
+
+    def client(self):
+        from telegram_async_client import AsyncTelegramClient
+        return AsyncTelegramClient('TOKEN', rate_limiter=self.limiter, transport=httpx.MockTransport(self.handler))
+
+    def run_with_client(self, send):
+        async def main():
+            async with self.client() as client:
+                return await send(client)
+        return asyncio.run(main())
+
+    def test_send_message_posts_form_data(self):
+        self.responses.append((200, {'ok': True, 'result': {'message_id': 7}}))
+        message = self.run_with_client(lambda client: client.send_message(42, 'hello'))
+
+        self.assertEqual(message, {'message_id': 7})
+        path, form = self.requests[0]
+        self.assertEqual(path, '/botTOKEN/sendMessage')
+        self.assertEqual(form, {'chat_id': ['42'], 'text': ['hello']})
+
+    def test_retry_after_is_retried(self):
+        self.responses.append((429, {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                                     'parameters': {'retry_after': 0}}))
+        self.responses.append((200, {'ok': True, 'result': {'message_id': 8}}))
+        message = self.run_with_client(lambda client: client.send_message(42, 'hello'))
+
+        self.assertEqual(message, {'message_id': 8})
+        self.assertEqual(len(self.requests), 2)
+
+    def test_errors_raise_telegram_error(self):
+        self.responses.append((400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat not found'}))
+        with self.assertRaises(TelegramError) as raised:
+            self.run_with_client(lambda client: client.send_message(42, 'hello'))
+        self.assertEqual(raised.exception.error_code, 400)
+
+    def test_send_invoices_async_counts_deliveries(self):
+        with mock.patch.dict(os.environ, {'TELEGRAM_BOT_TOKEN': 'TOKEN', 'TELEGRAM_ADMIN_USER_ID': '42'}):
+            from invoice_sender import InvoiceSender
+            sender = InvoiceSender()
+
+        self.responses.append((200, {'ok': True, 'result': {}}))
+        self.responses.append((400, {'ok': False, 'error_code': 400, 'description': "Bad Request: can't parse"}))
+        invoices = [{'invoice_number': 'INV-1'}, {'invoice_number': 'INV-2'}]
+        delivered = self.run_with_client(lambda client: sender.send_invoices_async(invoices, client=client))
+
+        self.assertEqual(delivered, 1)
+        self.assertEqual(len(self.requests), 2)
+        self.assertTrue(all(form['parse_mode'] == ['Markdown'] for _, form in self.requests))
+
+
+if __name__ == '__main__':
+    unittest.main()
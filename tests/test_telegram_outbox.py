@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+
+from auto_invoice_scanner import AutoInvoiceScanner
+from image_discovery import ImageFile
+from invoice_ocr import INVOICE_KEYWORDS
+from invoice_sender import InvoiceSender
+from simple_face_finder import SimpleFaceFinder
+from telegram_client import TelegramError, TelegramNetworkError, TelegramResult
+from telegram_file_cache import TelegramFileCache
+from telegram_outbox import OutboxSender, TelegramOutbox, file_dedupe_key, is_permanent_failure
+
+
+class TelegramOutboxTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp, 'outbox.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def outbox(self, **kwargs):
+        return TelegramOutbox('123:token', self.db_path, **kwargs)
+
+    def test_new_outbox_does_not_requeue_items_being_sent(self):
+        first = self.outbox()
+        first.enqueue('photo', 1, 'a', {})
+        self.assertEqual(len(first.claim_due(['photo'])), 1)
+
+        second = self.outbox()
+        self.assertEqual(second.claim_due(['photo']), [])
+        self.assertEqual(second.outstanding(['photo']), 1)
+
+    def test_timed_out_claim_is_taken_over(self):
+        first = self.outbox()
+        first.enqueue('photo', 1, 'a', {})
+        [item] = first.claim_due(['photo'])
+
+        second = self.outbox(claim_timeout=0)
+        self.assertEqual([i['id'] for i in second.claim_due(['photo'])], [item['id']])
+        # The original sender lost the claim, so its failure doesn't reschedule the item
+        self.assertIsNone(first.mark_failed(item, 'timeout'))
+
+    def test_permanent_failure_parks_item_immediately(self):
+        outbox = self.outbox()
+        item_id = outbox.enqueue('invoice', 1, 'a', {})
+        calls = []
+
+        def handler(item):
+            calls.append(item['id'])
+            raise TelegramError('sendMessage', "Bad Request: can't parse entities", 400)
+
+        sender = OutboxSender(outbox, {'invoice': handler})
+        sender.start()
+        self.assertTrue(sender.drain(timeout=5))
+        sender.stop()
+
+        self.assertEqual(calls, [item_id])
+        self.assertEqual(outbox.statuses([item_id]), {item_id: 'failed'})
+
+    def test_is_permanent_failure(self):
+        self.assertTrue(is_permanent_failure(TelegramError('sendPhoto', 'Bad Request', 400)))
+        self.assertTrue(is_permanent_failure(FileNotFoundError('gone.jpg')))
+        self.assertFalse(is_permanent_failure(TelegramError('sendPhoto', 'Too Many Requests', 429)))
+        self.assertFalse(is_permanent_failure(TelegramError('sendPhoto', 'Bad Gateway', 502)))
+        self.assertFalse(is_permanent_failure(TelegramNetworkError('sendPhoto', 'timed out')))
+        self.assertFalse(is_permanent_failure(RuntimeError('boom')))
+
+    def test_outbox_is_scoped_to_the_bot(self):
+        with mock.patch.dict(os.environ, {'SAPIER_DATA_DIR': self.tmp}):
+            first = TelegramOutbox('111:secret')
+            second = TelegramOutbox('222:secret')
+        first.enqueue('photo', 1, 'a', {})
+        self.assertNotEqual(first.db_path, second.db_path)
+        self.assertNotIn('secret', first.db_path)
+        self.assertEqual(second.outstanding(['photo']), 0)
+
+
+class FakeTelegram:
+    """Records Bot API calls instead of making them"""
+
+    def __init__(self):
+        self.calls = []
+
+    def call(self, method, data=None, files=None, **kwargs):
+        self.calls.append((method, dict(data or {})))
+        return TelegramResult(method, {'document': {'file_id': 'file-1'}}, 0.0)
+
+    def send_message(self, chat_id, text, **options):
+        return self.call('sendMessage', {'chat_id': chat_id, 'text': text, **options}).result
+
+
+class QueuedDeliveryTest(unittest.TestCase):
+    """Queued items go to the chat they were queued for, even after the admin chat changed"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.outbox = TelegramOutbox('123:token', os.path.join(self.tmp, 'outbox.db'))
+        self.telegram = FakeTelegram()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def deliver(self, kind, handler, key, payload):
+        item_id = self.outbox.enqueue(kind, 'old-chat', key, payload)
+        sender = OutboxSender(self.outbox, {kind: handler})
+        sender.start()
+        self.assertTrue(sender.drain(timeout=5))
+        sender.stop()
+        self.assertEqual(self.outbox.statuses([item_id]), {item_id: 'sent'})
+
+    def test_queued_photo_goes_to_its_chat(self):
+        path = os.path.join(self.tmp, 'photo.jpg')
+        with open(path, 'wb') as f:
+            f.write(b'jpeg')
+        finder = SimpleFaceFinder.__new__(SimpleFaceFinder)
+        finder.chat_id = 'new-chat'
+        finder.telegram = self.telegram
+        finder.send_originals = True
+        finder.file_cache = TelegramFileCache('123:token', os.path.join(self.tmp, 'file_ids.db'))
+        key = file_dedupe_key('photo', path, 4, 1.0)
+
+        self.deliver('photo', finder._deliver_queued_photo, key, {'path': path, 'caption': 'Photo 1'})
+
+        self.assertEqual([(method, data['chat_id']) for method, data in self.telegram.calls],
+                         [('sendDocument', 'old-chat')])
+        self.assertTrue(self.outbox.was_sent('old-chat', key))
+        self.assertFalse(self.outbox.was_sent('new-chat', key))
+
+    def test_queued_invoice_goes_to_its_chat(self):
+        scanner = AutoInvoiceScanner.__new__(AutoInvoiceScanner)
+        scanner.sender = InvoiceSender.__new__(InvoiceSender)
+        scanner.sender.chat_id = 'new-chat'
+        scanner.sender.telegram = self.telegram
+        key = file_dedupe_key('invoice', 'receipt.jpg', 4, 1.0)
+
+        self.deliver('invoice', scanner._deliver_queued_invoice, key, {'invoice_number': 'INV-1'})
+
+        [(method, data)] = self.telegram.calls
+        self.assertEqual((method, data['chat_id']), ('sendMessage', 'old-chat'))
+        self.assertTrue(self.outbox.was_sent('old-chat', key))
+
+    def test_invoice_scan_uses_catalog_identity(self):
+        scanner = AutoInvoiceScanner.__new__(AutoInvoiceScanner)
+        scanner.sender = InvoiceSender.__new__(InvoiceSender)
+        scanner.sender.chat_id = 'chat'
+        scanner.sender.telegram = self.telegram
+        scanner.outbox = self.outbox
+        scanner.invoice_keywords = list(INVOICE_KEYWORDS)
+        scanner.ocr_workers = 1
+        # Neither file exists any more: keys come from the catalog, so nothing is stat'ed
+        gone = ImageFile(os.path.join(self.tmp, 'gone.jpg'), 4, 1.0)
+        sent = ImageFile(os.path.join(self.tmp, 'sent.jpg'), 4, 1.0)
+        self.outbox.enqueue('invoice', 'chat', scanner._invoice_key(sent), {})
+        [item] = self.outbox.claim_due(['invoice'])
+        self.outbox.mark_sent(item)
+
+        def fake_ocr(image_paths, workers=None):
+            for image_path in image_paths:
+                yield image_path, "INVOICE\nTotal due: 12.00"
+        scanner.iter_texts = fake_ocr
+
+        processed, found, delivered = scanner._scan_images([gone, sent], 10, workers=1)
+
+        self.assertEqual((processed, found, delivered), (1, 1, 1))
+        self.assertEqual(len(self.telegram.calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+from telegram_rate_limiter import TelegramRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TelegramRateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = TelegramRateLimiter(global_rate=30, chat_rate=1, group_rate=20 / 60.0,
+                                           clock=self.clock, sleep=self.clock.sleep)
+
+    def test_chat_backlog_does_not_delay_other_chats(self):
+        # A bulk send books 20 slots for one chat up front (as asyncio.gather does)
+        delays = [self.limiter.reserve_chat(111) for _ in range(20)]
+        self.assertGreater(delays[-1], 15)
+
+        self.assertEqual(self.limiter.reserve_chat(222), 0)
+        self.assertEqual(self.limiter.take_global(), 0)
+
+    def test_private_chat_is_paced_after_burst(self):
+        delays = [self.limiter.reserve_chat(111) for _ in range(5)]
+        self.assertEqual(delays[:3], [0, 0, 0])
+        self.assertAlmostEqual(delays[3], 1.0)
+        self.assertAlmostEqual(delays[4], 2.0)
+
+    def test_global_rate_applies_across_chats(self):
+        for chat_id in range(30):
+            self.limiter.acquire(chat_id)
+        self.assertEqual(self.clock.now, 0)
+
+        self.limiter.acquire(30)
+        self.assertAlmostEqual(self.clock.now, 1 / 30)
+
+    def test_retry_after_blocks_only_that_chat(self):
+        self.limiter.backoff(10, 111)
+        self.assertAlmostEqual(self.limiter.reserve_chat(111), 10)
+        self.assertEqual(self.limiter.reserve_chat(222), 0)
+
+    def test_global_retry_after_blocks_every_chat(self):
+        self.limiter.backoff(5)
+        self.limiter.acquire(111)
+        self.assertAlmostEqual(self.clock.now, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
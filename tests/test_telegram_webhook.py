@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+from telegram_webhook import SECRET_HEADER, WebhookServer
+from update_dispatcher import ChatDispatcher
+
+
+class WebhookServerTest(unittest.TestCase):
+    """A local fake Telegram that POSTs updates to the receiver"""
+
+    def setUp(self):
+        self.handled = []
+        self.lock = threading.Lock()
+        self.dispatcher = ChatDispatcher(self.handle, max_workers=2)
+        self.server = WebhookServer(
+            lambda update: self.dispatcher.submit(update['message']['chat']['id'], update),
+            secret_token='s3cret', port=0
+        ).start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.dispatcher.shutdown()
+
+    def handle(self, update):
+        with self.lock:
+            self.handled.append(update['update_id'])
+
+    def post(self, body, secret='s3cret'):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+        request = urllib.request.Request(self.server.url, data=data, method='POST',
+                                         headers={'Content-Type': 'application/json'})
+        if secret is not None:
+            request.add_header(SECRET_HEADER, secret)
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def wait_handled(self, count, timeout=5):
+        # The receiver acknowledges before it queues the update, so the reply can arrive first
+        deadline = time.monotonic() + timeout
+        while len(self.handled) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(self.dispatcher.wait_idle(timeout=timeout))
+
+    @staticmethod
+    def update(update_id, chat_id=7):
+        return {'update_id': update_id, 'message': {'message_id': update_id, 'chat': {'id': chat_id}, 'text': 'hi'}}
+
+    def test_valid_updates_are_acknowledged_and_dispatched_in_order(self):
+        for update_id in range(1, 6):
+            self.assertEqual(self.post(self.update(update_id)), 200)
+
+        self.wait_handled(5)
+        self.assertEqual(self.handled, [1, 2, 3, 4, 5])
+        self.assertEqual(self.server.received, 5)
+
+    def test_wrong_or_missing_secret_is_rejected(self):
+        self.assertEqual(self.post(self.update(1), secret='wrong'), 403)
+        self.assertEqual(self.post(self.update(2), secret=None), 403)
+
+        self.assertTrue(self.dispatcher.wait_idle(timeout=5))
+        self.assertEqual(self.handled, [])
+        self.assertEqual(self.server.received, 0)
+
+    def test_malformed_bodies_are_rejected(self):
+        self.assertEqual(self.post(b'not json'), 400)
+        self.assertEqual(self.post([1, 2, 3]), 400)
+        self.assertEqual(self.post({'message': {}}), 400)
+        self.assertEqual(self.server.received, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
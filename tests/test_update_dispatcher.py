@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from simple_telegram_bot import SimpleTelegramBot
+from update_dispatcher import ChatDispatcher
+
+
+class ChatDispatcherTest(unittest.TestCase):
+    def test_chat_order_kept_and_slow_chat_does_not_block_others(self):
+        release = threading.Event()
+        handled = []
+        lock = threading.Lock()
+
+        def handler(update):
+            chat, n = update
+            if chat == 'slow' and n == 0:
+                release.wait(5)
+            if chat == 'broken':
+                raise RuntimeError('boom')
+            with lock:
+                handled.append(update)
+
+        dispatcher = ChatDispatcher(handler, max_workers=4)
+        for n in range(3):
+            dispatcher.submit('slow', ('slow', n))
+            dispatcher.submit('fast', ('fast', n))
+            dispatcher.submit('broken', ('broken', n))
+
+        # The fast chat finishes while the slow chat's first update is still running
+        for _ in range(100):
+            with lock:
+                if sum(1 for chat, _ in handled if chat == 'fast') == 3:
+                    break
+            time.sleep(0.02)
+        with lock:
+            self.assertEqual([u for u in handled if u[0] == 'fast'], [('fast', 0), ('fast', 1), ('fast', 2)])
+            self.assertNotIn(('slow', 0), handled)
+
+        release.set()
+        self.assertTrue(dispatcher.wait_idle(5))
+        dispatcher.shutdown()
+        self.assertEqual([u for u in handled if u[0] == 'slow'], [('slow', 0), ('slow', 1), ('slow', 2)])
+        self.assertEqual(dispatcher.pending(), 0)
+
+
+class UpdateOffsetTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def bot(self, token):
+        with mock.patch.dict(os.environ, {'TELEGRAM_BOT_TOKEN': token, 'SAPIER_DATA_DIR': self.tmp}):
+            bot = SimpleTelegramBot()
+        self.addCleanup(bot.jobs.shutdown)
+        self.addCleanup(bot.dispatcher.shutdown)
+        return bot
+
+    def test_offset_survives_restart_per_bot(self):
+        bot = self.bot('42:secret')
+        self.assertEqual(bot.last_update_id, 0)
+        bot.last_update_id = 17
+        bot.save_offset()
+
+        restarted = self.bot('42:secret')
+        restarted.telegram = mock.Mock()
+        restarted.get_updates()
+
+        self.assertEqual(restarted.last_update_id, 17)
+        self.assertEqual(restarted.telegram.get_updates.call_args.kwargs['offset'], 18)
+        self.assertNotIn('secret', restarted.offset_path)
+        self.assertEqual(self.bot('43:other').last_update_id, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Update Dispatcher
+Runs bot update handlers on a thread pool while keeping each chat's updates in order.
+
+Every chat gets its own FIFO. Only one of its updates is being handled at a
+time, but different chats are handled in parallel, so a slow command in one
+chat never holds up replies in another. A worker handles one update and then
+re-queues the chat behind the others, which keeps a chatty chat from
+monopolising a worker.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def default_handler_workers():
+    """Number of update handler threads (SAPIER_BOT_WORKERS, default 8)"""
+    return max(1, int(os.getenv('SAPIER_BOT_WORKERS', '8')))
+
+
+class ChatDispatcher:
+    def __init__(self, handler, max_workers=None):
+        self.handler = handler
+        self.max_workers = max_workers or default_handler_workers()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bot-handler')
+        self._idle = threading.Condition()
+        self._queues = {}  # chat key -> pending updates; present while the chat has work scheduled
+
+    def submit(self, chat_key, update):
+        """Queue an update for handler(update), after any earlier updates from the same chat"""
+        with self._idle:
+            pending = self._queues.get(chat_key)
+            if pending is not None:
+                pending.append(update)
+                return
+            self._queues[chat_key] = deque([update])
+        self._executor.submit(self._run_next, chat_key)
+
+    def pending(self):
+        """Number of updates queued or being handled"""
+        with self._idle:
+            return sum(len(pending) for pending in self._queues.values())
+
+    def _run_next(self, chat_key):
+        with self._idle:
+            update = self._queues[chat_key][0]
+
+        try:
+            self.handler(update)
+        except Exception as e:
+            print(f"❌ Error handling update: {e}")
+
+        with self._idle:
+            pending = self._queues[chat_key]
+            pending.popleft()
+            if not pending:
+                del self._queues[chat_key]
+                self._idle.notify_all()
+                return
+        try:
+            self._executor.submit(self._run_next, chat_key)
+        except RuntimeError:
+            # Shut down without waiting: drop what this chat still had queued
+            with self._idle:
+                del self._queues[chat_key]
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Wait until every queued update has been handled (False on timeout)"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._queues, timeout)
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads, first finishing queued updates when wait=True"""
+        if wait:
+            self.wait_idle()
+        self._executor.shutdown(wait=wait)
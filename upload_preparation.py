@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Upload Preparation
+Shrinks photos to a size-bounded JPEG/WebP before they are uploaded to Telegram.
+
+Telegram recompresses photos to about 1280px anyway, so uploading a 12 MB
+original mostly wastes uplink time. Prepared renditions are cached on disk
+by source identity (path + size + mtime + settings). The cache is trimmed to
+SAPIER_UPLOAD_CACHE_MB, oldest renditions first.
+
+Settings: SAPIER_UPLOAD_MAX_SIDE (default 1280), SAPIER_UPLOAD_QUALITY
+(default 85) and SAPIER_UPLOAD_FORMAT (jpeg or webp).
+"""
+
+import os
+import hashlib
+import threading
+from sapier_storage import data_path
+from image_decoding import load_reduced, read_image_dimensions
+
+# Originals this small in both bytes and pixels are uploaded untouched
+_PASSTHROUGH_BYTES = 512 * 1024
+_PASSTHROUGH_EXTENSIONS = {'.jpg', '.jpeg'}
+
+
+class UploadPreparer:
+    def __init__(self, max_side=None, quality=None, image_format=None, cache_dir=None, cache_mb=None):
+        self.max_side = max_side or int(os.getenv('SAPIER_UPLOAD_MAX_SIDE', '1280'))
+        self.quality = quality or int(os.getenv('SAPIER_UPLOAD_QUALITY', '85'))
+        self.image_format = (image_format or os.getenv('SAPIER_UPLOAD_FORMAT', 'jpeg')).lower()
+        if self.image_format not in ('jpeg', 'webp'):
+            raise ValueError(f"Unsupported upload format: {self.image_format}")
+
+        self.cache_dir = cache_dir or data_path('upload_cache')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.cache_bytes = (cache_mb or int(os.getenv('SAPIER_UPLOAD_CACHE_MB', '500'))) * 1024 * 1024
+        self._lock = threading.Lock()
+        self._written_since_trim = 0
+
+    def _cache_path(self, image_path, size, mtime):
+        key = f"{image_path}|{size}|{mtime}|{self.max_side}|{self.quality}|{self.image_format}"
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.{'jpg' if self.image_format == 'jpeg' else 'webp'}")
+
+    def _is_small_enough(self, image_path, size):
+        if size > _PASSTHROUGH_BYTES or os.path.splitext(image_path)[1].lower() not in _PASSTHROUGH_EXTENSIONS:
+            return False
+        dimensions = read_image_dimensions(image_path)
+        return dimensions is not None and max(dimensions) <= self.max_side
+
+    def prepare(self, image_path, size=None, mtime=None):
+        """Return the path of a size-bounded rendition of image_path (or the original if it is already small)"""
+        if size is None or mtime is None:
+            st = os.stat(image_path)
+            size, mtime = st.st_size, st.st_mtime
+
+        if self._is_small_enough(image_path, size):
+            return image_path
+
+        cached = self._cache_path(image_path, size, mtime)
+        if os.path.exists(cached):
+            return cached
+
+        import cv2  # Deferred so importing this module doesn't load OpenCV
+        image, _ = load_reduced(image_path, self.max_side, color=True)
+        if image is None:
+            # Let Telegram deal with formats OpenCV can't decode
+            return image_path
+
+        if self.image_format == 'webp':
+            ok, encoded = cv2.imencode('.webp', image, [cv2.IMWRITE_WEBP_QUALITY, self.quality])
+        else:
+            ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, self.quality,
+                                                      cv2.IMWRITE_JPEG_OPTIMIZE, 1])
+        if not ok or len(encoded) >= size:
+            return image_path
+
+        # Write atomically so a concurrent reader never sees a partial file
+        tmp_path = f"{cached}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, cached)
+
+        with self._lock:
+            self._written_since_trim += 1
+            if self._written_since_trim >= 50:
+                self._written_since_trim = 0
+                self._trim()
+        return cached
+
+    def _trim(self):
+        """Delete the oldest renditions once the cache exceeds its byte budget"""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+
+        entries.sort()
+        for _, entry_size, path in entries:
+            if total <= self.cache_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= entry_size
+            except OSError:
+                continue